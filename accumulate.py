@@ -0,0 +1,312 @@
+#!/usr/bin/python
+
+# python accumulate.py <day_or_hour_file> [rows_per_update]
+#
+# Mergeable accumulators for the per-feature behavior markers, so that the
+# markers of a day or hour table can be updated one day at a time and the
+# states of separately processed shards can be combined. Counts, means,
+# standard deviations, maxima, minima, skewness, kurtosis and signal energy
+# are exact. Medians, interquartile ranges and zero and mean crossings are
+# exact up to sketch_size rows and come from quantile sketches beyond that.
+#
+# Run as a script, the accumulated markers of a day or hour file written by
+# DM are compared with BehaviorStats.extract_component_features.
+
+# Copyright (c) 2020. Washington State University (WSU). All rights reserved.
+# Code and data may not be used or distributed without permission from WSU.
+
+
+import copy
+import sys
+
+import numpy as np
+
+import bstats
+import markerschema
+
+sketch_size = 1024  # number of values kept per level of the quantile sketches
+
+
+class QuantileSketch:
+
+    def __init__(self, num_features, size=sketch_size):
+        """ Constructor
+        A Munro-Paterson style sketch of the values of each feature. Level l
+        holds values that each stand for 2^l input values. Every input row
+        adds one value to every feature, so each level is stored as one
+        (values x features) matrix that is compacted for all features at once.
+        Quantiles and ranks are exact until more than size values have been
+        added.
+        """
+        self.size = size
+        self.levels = [np.zeros((0, num_features))]
+        self.compactions = 0
+
+    def add(self, rows):
+        """ Add a (rows x features) block of values.
+        """
+        self.levels[0] = np.vstack((self.levels[0], rows))
+        self.compact()
+
+    def merge(self, other):
+        """ Add the values summarized by another sketch.
+        """
+        for level, values in enumerate(other.levels):
+            if level == len(self.levels):
+                self.levels.append(values.copy())
+            else:
+                self.levels[level] = np.vstack((self.levels[level], values))
+        self.compactions += other.compactions
+        self.compact()
+
+    def compact(self):
+        """ Halve every level that holds more than size values: sort each
+        feature's values and promote every other one to the next level. The
+        starting offset alternates between compactions so that the rounding
+        errors do not accumulate in one direction.
+        """
+        level = 0
+        while level < len(self.levels):
+            values = self.levels[level]
+            if len(values) > self.size:
+                num = len(values) - (len(values) % 2)
+                values = np.sort(values, axis=0)
+                promoted = values[self.compactions % 2:num:2]
+                self.compactions += 1
+                self.levels[level] = values[num:]
+                if level + 1 == len(self.levels):
+                    self.levels.append(promoted)
+                else:
+                    self.levels[level + 1] = np.vstack((self.levels[level + 1],
+                                                        promoted))
+            level += 1
+
+    def weights(self):
+        """ Return the number of input values each stored value stands for.
+        """
+        return np.concatenate([np.full(len(level_values), 2 ** level)
+                               for level, level_values in enumerate(self.levels)])
+
+    def ranked_values(self, ranks):
+        """ Return the value of each feature at each 0-based rank in the
+        sorted input, as a (ranks x features) array. Each stored value covers
+        2^level consecutive ranks.
+        """
+        values = np.vstack(self.levels)
+        order = np.argsort(values, axis=0, kind='stable')
+        cumulative = np.cumsum(self.weights()[order], axis=0)
+        sorted_values = np.take_along_axis(values, order, axis=0)
+        result = np.zeros((len(ranks), values.shape[1]))
+        for i, rank in enumerate(ranks):
+            position = np.argmax(cumulative > rank, axis=0)
+            result[i] = sorted_values[position, np.arange(values.shape[1])]
+        return result
+
+    def count_below(self, thresholds, inclusive=False):
+        """ Return the number of values of each feature that are below (or,
+        if inclusive, at most) the feature's threshold.
+        """
+        values = np.vstack(self.levels)
+        if inclusive:
+            below = values <= thresholds
+        else:
+            below = values < thresholds
+        return self.weights() @ below
+
+    def median(self, count):
+        """ Median of each feature, as computed by np.median.
+        """
+        if count % 2 == 1:
+            return self.ranked_values([count // 2])[0]
+        middle = self.ranked_values([count // 2 - 1, count // 2])
+        return np.mean(middle, axis=0)
+
+    def interquartile_range(self, count):
+        """ Interquartile range of each feature, using the same ranks as
+        features.interquartile_range.
+        """
+        quartiles = self.ranked_values([count // 4, (3 * count) // 4])
+        return quartiles[1] - quartiles[0]
+
+
+class ComponentAccumulator:
+
+    def __init__(self, num_features, size=sketch_size):
+        """ Constructor
+        Holds the count, mean and central moment sums (combined with the
+        pairwise formulas of Pebay), maxima, minima and signal energy of each
+        feature, and a quantile sketch for the medians and interquartile
+        ranges. A pair of consecutive values crosses a reference value if the
+        reference lies strictly between them, so crossings are counted from
+        sketches of the lower and upper value of every consecutive pair once
+        the final median and mean are known. The first and last rows are
+        kept to add the pair at the boundary when states are merged.
+        """
+        self.count = 0
+        self.mean = np.zeros(num_features)
+        self.m2 = np.zeros(num_features)
+        self.m3 = np.zeros(num_features)
+        self.m4 = np.zeros(num_features)
+        self.maxes = np.full(num_features, -np.inf)
+        self.mins = np.full(num_features, np.inf)
+        self.energy = np.zeros(num_features)
+        self.sketch = QuantileSketch(num_features, size)
+        self.lows = QuantileSketch(num_features, size)
+        self.highs = QuantileSketch(num_features, size)
+        self.first = None
+        self.last = None
+
+    def combine_moments(self, count, mean, m2, m3, m4):
+        """ Combine the moments of another set of rows with these moments.
+        """
+        na = self.count
+        nb = count
+        n = na + nb
+        delta = mean - self.mean
+        new_mean = self.mean + delta * nb / n
+        new_m2 = self.m2 + m2 + delta ** 2 * na * nb / n
+        new_m3 = self.m3 + m3 + delta ** 3 * na * nb * (na - nb) / n ** 2 + \
+            3 * delta * (na * m2 - nb * self.m2) / n
+        new_m4 = self.m4 + m4 + \
+            delta ** 4 * na * nb * (na * na - na * nb + nb * nb) / n ** 3 + \
+            6 * delta ** 2 * (na * na * m2 + nb * nb * self.m2) / n ** 2 + \
+            4 * delta * (na * m3 - nb * self.m3) / n
+        self.count = n
+        self.mean, self.m2, self.m3, self.m4 = new_mean, new_m2, new_m3, new_m4
+
+    def add_pairs(self, before, after):
+        """ Add the consecutive value pairs (before[i], after[i]) to the pair
+        sketches. Pairs of equal values never cross, so both of their
+        bounds are stored as infinity, which no reference value reaches.
+        """
+        lows = np.minimum(before, after)
+        highs = np.maximum(before, after)
+        equal = lows == highs
+        self.lows.add(np.where(equal, np.inf, lows))
+        self.highs.add(np.where(equal, np.inf, highs))
+
+    def crossings(self, reference):
+        """ Count the consecutive pairs of each feature whose values lie on
+        either side of the reference value.
+        """
+        return self.lows.count_below(reference) - \
+            self.highs.count_below(reference, inclusive=True)
+
+    def add(self, rows):
+        """ Add a (rows x features) block of values that follows the rows
+        already added.
+        """
+        rows = np.array(rows, dtype=float, ndmin=2)
+        if len(rows) == 0:
+            return
+        mean = np.mean(rows, axis=0)
+        centered = rows - mean
+        squares = centered * centered
+        self.combine_moments(len(rows), mean, np.sum(squares, axis=0),
+                             np.sum(squares * centered, axis=0),
+                             np.sum(squares * squares, axis=0))
+        self.maxes = np.maximum(self.maxes, np.max(rows, axis=0))
+        self.mins = np.minimum(self.mins, np.min(rows, axis=0))
+        self.energy += np.sum(rows * rows, axis=0)
+        self.sketch.add(rows)
+        if self.last is not None:
+            rows_before = np.vstack((self.last, rows[:-1]))
+            self.add_pairs(rows_before, rows)
+        else:
+            self.add_pairs(rows[:-1], rows[1:])
+            self.first = rows[0].copy()
+        self.last = rows[-1].copy()
+
+    def merge(self, other):
+        """ Add the state of the rows that follow the rows of this state,
+        for example the next shard of a recording.
+        """
+        if other.count == 0:
+            return
+        if self.count == 0:
+            self.__dict__.update(copy.deepcopy(other.__dict__))
+            return
+        self.combine_moments(other.count, other.mean, other.m2, other.m3, other.m4)
+        self.maxes = np.maximum(self.maxes, other.maxes)
+        self.mins = np.minimum(self.mins, other.mins)
+        self.energy += other.energy
+        self.sketch.merge(other.sketch)
+        self.add_pairs(self.last[np.newaxis, :], other.first[np.newaxis, :])
+        self.lows.merge(other.lows)
+        self.highs.merge(other.highs)
+        self.last = other.last.copy()
+
+    def component_features(self, out=None):
+        """ Return the statistics of BehaviorStats.extract_component_features
+        computed from the accumulated state. If out is given, the statistics
+        are written into it.
+        """
+        k = len(self.mean)
+        num_stats = len(markerschema.component_stats)
+        if out is None:
+            out = np.zeros(num_stats * k)
+        else:
+            out[:] = 0.0
+        blocks = out.reshape(num_stats, k)
+        if self.count == 0:
+            return out
+        n = float(self.count)
+        std = np.sqrt(self.m2 / n)
+        blocks[0] = self.mean
+        blocks[1] = self.sketch.median(self.count)
+        blocks[2] = std
+        blocks[3] = self.maxes
+        blocks[4] = self.mins
+        if self.count > 1:  # leave zc, mc, iqr, skew, k, se at 0 for one time unit
+            blocks[5] = self.crossings(blocks[1])
+            blocks[6] = self.crossings(self.mean)
+            blocks[7] = self.sketch.interquartile_range(self.count)
+            n2 = (self.m2 / n) ** 1.5
+            with np.errstate(divide='ignore', invalid='ignore'):
+                blocks[8] = np.where(n2 == 0, 0.0, (self.m3 / n) / n2)
+                blocks[9] = np.where(std == 0, -3.0, (self.m4 / n) / std ** 4 - 3.0)
+            blocks[10] = self.energy
+        return out
+
+
+def accumulate_rows(accumulator, rows):
+    """ Add rows to an accumulator that may not exist yet.
+    """
+    rows = np.array(rows, dtype=float, ndmin=2)
+    if accumulator is None:
+        accumulator = ComponentAccumulator(rows.shape[1])
+    accumulator.add(rows)
+    return accumulator
+
+
+def compare(data, rows_per_update=1):
+    """ Accumulate data (a day or hour table) rows_per_update rows at a time
+    and return, for each statistic, the largest difference from
+    BehaviorStats.extract_component_features relative to the largest
+    magnitude of that statistic.
+    """
+    data = np.array(data, dtype=float, ndmin=2)
+    accumulator = None
+    for start in range(0, len(data), rows_per_update):
+        accumulator = accumulate_rows(accumulator, data[start:start + rows_per_update])
+    num_stats = len(markerschema.component_stats)
+    expected = bstats.BehaviorStats().extract_component_features(data)
+    expected = expected.reshape(num_stats, -1)
+    actual = accumulator.component_features().reshape(num_stats, -1)
+    scale = np.maximum(np.max(np.abs(expected), axis=1), 1.0)
+    return np.max(np.abs(actual - expected), axis=1) / scale
+
+
+def main(filename, rows_per_update=1):
+    data = np.loadtxt(filename, delimiter=',', ndmin=2)
+    errors = compare(data, rows_per_update)
+    print(len(data), 'rows,', rows_per_update, 'per update, sketch size', sketch_size)
+    for name, error in zip(markerschema.component_stats, errors):
+        print(name, error)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Need to specify a day or hour file\n")
+        exit()
+    main(sys.argv[1], int(sys.argv[2]) if len(sys.argv) > 2 else 1)
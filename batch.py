@@ -0,0 +1,149 @@
+#!/usr/bin/python
+
+# python batch.py [options] <directory|manifest>
+#
+# Extract digital behavior markers for many input files.
+#
+# Input is a directory of csv files containing sensor data, or a manifest
+# file that lists one input file per line. Each input file is processed as
+# by dm.py, using a pool of worker processes. A failure on one input file is
+# reported and does not stop the remaining files.
+
+# Copyright (c) 2020. Washington State University (WSU). All rights reserved.
+# Code and data may not be used or distributed without permission from WSU.
+
+
+import os.path
+import sys
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+import dm
+import loc
+
+# suffixes of files written by DM, skipped when listing a directory
+output_suffixes = ('.bm', '.bcd', '.day', '.hour', '.index', '.npy', '.json', '.prof',
+                   '.html')
+
+# global variables, set once in each worker process
+worker_dm = None
+worker_location = None
+
+
+def list_inputs(path):
+    """ Return the absolute paths of the input files named by path, which is
+    either a directory of input files or a manifest file with one input file
+    per line. Relative names in a manifest are relative to the directory of
+    the manifest. The paths are absolute so that process_file does not join
+    the data path to them a second time.
+    """
+    path = os.path.abspath(path)
+    if os.path.isdir(path):
+        names = sorted(os.listdir(path))
+        return [os.path.join(path, name) for name in names
+                if os.path.isfile(os.path.join(path, name)) and
+                not name.startswith('.') and not name.endswith(output_suffixes)]
+    inputs = list()
+    base = os.path.dirname(path)
+    with open(path, "r") as file:
+        for line in file:
+            name = line.strip()
+            if name and not name.startswith('#'):
+                inputs.append(os.path.abspath(os.path.join(base, name)))
+    return inputs
+
+
+def init_worker(args):
+    """ Load the resources shared by all input files (options, location
+    mappings, and known locations) once per worker process.
+    """
+    global worker_dm
+    global worker_location
+
+    worker_dm = dm.DM()
+    worker_dm.cf.set_parameters(args)
+    worker_location = loc.Location()
+    worker_location.read_location_mappings()
+    worker_location.read_locations()
+
+
+def run_file(filename):
+    """ Process one input file in a worker. Return the file name and None,
+    or the file name and a description of the error.
+    """
+    try:
+        dm.process_file(worker_dm, filename, worker_location)
+        return filename, None
+    except Exception:
+        return filename, traceback.format_exc()
+
+
+def run_pool(inputs, args, workers):
+    """ Process the input files in a pool of worker processes. Return the
+    (filename, error) pairs of the files that finished and the list of files
+    that did not, because a worker process died (for example, killed when
+    out of memory) and broke the pool.
+    """
+    results = list()
+    broken = list()
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                             initargs=(args,)) as executor:
+        futures = {executor.submit(run_file, filename): filename for filename in inputs}
+        for future in as_completed(futures):
+            try:
+                results.append(future.result())
+            except BrokenProcessPool:
+                broken.append(futures[future])
+    return results, broken
+
+
+def run_parallel(inputs, args, workers):
+    """ Process the input files with several workers and return the
+    (filename, error) pair of each file. The files left unfinished when a
+    worker dies are run again one at a time in a fresh single-worker pool,
+    so the remaining files are still processed and a file that kills its
+    own worker is reported as a failure.
+    """
+    results, broken = run_pool(inputs, args, workers)
+    for filename in broken:
+        retry, failed = run_pool([filename], args, 1)
+        results += retry
+        if failed:
+            results.append((filename, 'Worker process terminated abruptly\n'))
+    return results
+
+
+def main():
+    args = list(sys.argv)
+    batch = dm.DM()
+    path = batch.cf.set_parameters(args)
+    if path is None:
+        print("Supply a directory or manifest of input files.")
+        exit()
+    if batch.cf.incremental is not None:
+        print("The --incremental state file holds one participant; run dm.py for each.")
+        exit()
+    inputs = list_inputs(os.path.join(batch.cf.datapath, path))
+    failures = list()
+    if batch.cf.workers > 1:
+        results = run_parallel(inputs, args, batch.cf.workers)
+        order = {filename: i for i, filename in enumerate(inputs)}
+        results.sort(key=lambda result: order[result[0]])
+    else:
+        init_worker(args)
+        results = map(run_file, inputs)
+    for filename, error in results:
+        if error is not None:
+            print('Error processing', filename)
+            failures.append((filename, error))
+    print('Processed', len(inputs) - len(failures), 'of', len(inputs), 'files')
+    for filename, error in failures:
+        print('Failed:', filename)
+        print(error)
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -11,8 +11,12 @@
 # Code and data may not be used or distributed without permission from WSU.
 
 
+import functools
+import itertools
+import math
 import os.path
 import sys
+from concurrent.futures import ProcessPoolExecutor
 
 import numpy as np
 
@@ -21,99 +25,232 @@ import config
 
 class BCD:
 
-    def __init__(self):
+    def __init__(self, seed=None, num_workers=1):
         """ Constructor
         """
         self.num_permutations = 1000  # number of permutations to test
+        self.seed = seed  # seed of the permutations, None = fresh entropy
+        self.num_workers = num_workers  # number of processes comparing weeks
+        self.permutation_mode = 'random'  # 'random', 'adaptive' or 'exact'
+        self.batch_size = 50  # permutations evaluated together, bounds the memory used
+        self.min_exceedances = 50  # Besag-Clifford stopping count in adaptive mode
+        self.confidence_z = 2.576  # z value of the adaptive p-value interval (99%)
+        self.num_used = 0  # permutations used by the last permutation_change
+        self.permutations_used = list()  # permutations used for each week
 
     @staticmethod
     def kl_divergence(p, q):
         """ Compute the Kullback-Leibler divergence between two input distributions.
         """
-        p = np.asarray(p, dtype=np.float)
-        q = np.asarray(q, dtype=np.float)
-        kl_sum1 = 0
-        kl_sum2 = 0
-        for i in range(0, p.size):
-            if p[i] != 0.0 and q[i] != 0.0:
-                v1 = p[i] / q[i]
-                v2 = q[i] / p[i]
-                if v1 != 0.0:
-                    kl_sum1 += float(p[i] * np.log(v1))
-                if v2 != 0.0:
-                    kl_sum2 += float(q[i] * np.log(v2))
-        temp = (kl_sum1 + kl_sum2) / 2  # symmetric kl divergence
-        return temp
+        p = np.asarray(p, dtype=float)
+        q = np.asarray(q, dtype=float)
+        return float(BCD.kl_divergence_batch(p, q))
 
     @staticmethod
-    def normalize_change_score(p_vals, alpha_star=0.01):
+    def kl_divergence_batch(p, q):
+        """ Compute the symmetric Kullback-Leibler divergence between pairs of
+        distributions stored along the last axis of the input arrays.
+        Elements where either distribution is zero are skipped. The terms are
+        added in order one element at a time, as the original per-hour loop
+        did, so that ties between distances are the same.
+        """
+        with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+            valid = (p != 0.0) & (q != 0.0)
+            v1 = np.where(valid, p / q, 0.0)
+            v2 = np.where(valid, q / p, 0.0)
+            kl1 = np.where(v1 != 0.0, p * np.log(np.where(v1 != 0.0, v1, 1.0)), 0.0)
+            kl2 = np.where(v2 != 0.0, q * np.log(np.where(v2 != 0.0, v2, 1.0)), 0.0)
+        kl_sum1 = np.zeros(kl1.shape[:-1])
+        kl_sum2 = np.zeros(kl2.shape[:-1])
+        for i in range(kl1.shape[-1]):
+            kl_sum1 += kl1[..., i]
+            kl_sum2 += kl2[..., i]
+        return (kl_sum1 + kl_sum2) / 2  # symmetric kl divergence
+
+    @staticmethod
+    def normalize_change_score(p_vals, alpha_star=0.01, repeats=1):
         """ Normalize the change scores to lie in the range [0.0, 1.0].
+        The result is the same as for a list in which each of the input
+        p-values occurs repeats times. For each distinct p-value, the number
+        of sorted positions i whose threshold i * alpha_star / m is at least
+        the p-value is found directly instead of testing every position.
         """
-        m = len(p_vals)
+        m = len(p_vals) * repeats
         sig_changes_count = 0
-        p_vals.sort()
-        threshold = np.zeros(m)
-        for i in range(1, m + 1):
-            threshold = i * alpha_star / m
-            if p_vals[i - 1] <= threshold:
-                sig_changes_count += 1
-        sig_changes_count /= float(len(p_vals))
+        for b, p_val in enumerate(np.sort(p_vals)):
+            first = (b * repeats) + 1  # positions of this p-value in the sorted list
+            last = (b + 1) * repeats
+            i = min(max(first, int(math.ceil(p_val * m / alpha_star))), last + 1)
+            while i > first and ((i - 1) * alpha_star / m) >= p_val:
+                i -= 1
+            while i <= last and (i * alpha_star / m) < p_val:
+                i += 1
+            sig_changes_count += (last - i) + 1
+        sig_changes_count /= float(m)
         if sig_changes_count > 1.0:
             sig_changes_count = 1.0
         return sig_changes_count
 
     @staticmethod
-    def test_permute_days_significance(pvector, distance, permute_days_cutoff):
-        """ Determine the statistical significance of the results formed by
-        permutation testing.
+    def permutation_p_values(new_distance, distance):
+        """ Compute, for each hour (column), the fraction of permutation
+        distances that are at least the observed distance, using one sort
+        and binary search per hour.
+        """
+        nump = len(new_distance)
+        p_vals = np.zeros(len(distance))
+        for j in range(len(distance)):
+            pvector = new_distance[:, j]
+            pvector = np.sort(pvector[~np.isnan(pvector)])
+            if not np.isnan(distance[j]):
+                greater_count = len(pvector) - np.searchsorted(pvector, distance[j], side='left')
+                p_vals[j] = float(greater_count) / float(nump)
+        return p_vals
+
+    def permutation_indices(self, num_shuffled, rng, num_permutations=None):
+        """ Generate the day orderings of all permutations at once, one
+        random permutation of range(num_shuffled) per row, drawn from the
+        np.random.Generator rng.
+        """
+        if num_permutations is None:
+            num_permutations = self.num_permutations
+        keys = rng.random((num_permutations, num_shuffled))
+        return np.argsort(keys, axis=1)
+
+    @staticmethod
+    def half_sums(data, day_inds):
+        """ Sum the days of data (days x hours x features) selected by each
+        row of day_inds. The days are added one at a time in the order given,
+        as np.sum adds the days of one half, so that a split gives exactly the
+        same sums (and distance) however it was generated.
+        """
+        total = data[day_inds[:, 0]]
+        for i in range(1, day_inds.shape[1]):
+            total += data[day_inds[:, i]]
+        return total
+
+    def permutation_distances(self, data, shuffle_inds, num_days):
+        """ Compute the hourly change between the two halves of every
+        permutation of the days in data (days x hours x features).
+        The first num_days entries of each row of shuffle_inds select the
+        first half and the remaining entries the second half. The result has
+        one row per permutation and one column per hour.
+        """
+        first_df = self.half_sums(data, shuffle_inds[:, :num_days])
+        second_df = self.half_sums(data, shuffle_inds[:, num_days:])
+        # compute change based on symmetric Kullback-Leibler divergence
+        return self.kl_divergence_batch(first_df, second_df)
+
+    def random_distances(self, data, num_days, rng):
+        """ Compute the hourly change for num_permutations random permutations
+        of the 2 * num_days days in data. The permutations are drawn and
+        evaluated in blocks of batch_size, so memory use depends on batch_size
+        rather than on the number of permutations. The permutations are the
+        same as when they are drawn all at once.
+        """
+        block = max(1, self.batch_size)
+        return np.concatenate([self.permutation_distances(
+            data, self.permutation_indices(2 * num_days, rng,
+                                           min(block, self.num_permutations - i)),
+            num_days) for i in range(0, self.num_permutations, block)], axis=0)
+
+    def exact_distances(self, data, num_days):
+        """ Compute the hourly change for every split of the 2 * num_days days
+        in data into two halves. Swapping the halves gives the same symmetric
+        divergence, so only the splits whose first half holds day 0 are
+        evaluated, in blocks of batch_size splits.
+        """
+        splits = split_indices(len(data), num_days)
+        block = max(1, self.batch_size)
+        return np.concatenate([self.permutation_distances(data, splits[i:i + block],
+                                                          num_days)
+                               for i in range(0, len(splits), block)], axis=0)
+
+    @staticmethod
+    def wilson_interval(count, n, z):
+        """ Compute the Wilson score interval of a binomial proportion
+        count / n for the normal quantile z.
+        """
+        p = count / n
+        denominator = 1.0 + (z * z / n)
+        center = (p + (z * z / (2.0 * n))) / denominator
+        half_width = (z / denominator) * np.sqrt((p * (1.0 - p) / n) + (z * z / (4.0 * n * n)))
+        return center - half_width, center + half_width
+
+    def adaptive_p_values(self, data, distance, num_days, cutoff, rng):
+        """ Estimate the permutation p-value of each hour with sequential
+        Monte Carlo testing. Permutations are run in batches. An hour stops
+        once its p-value is clearly above the cutoff: either its Wilson
+        interval lies entirely above the cutoff, or it has reached
+        min_exceedances permutation distances at least as large as the
+        observed one (Besag-Clifford). Small p-values are compared against
+        thresholds well below the cutoff, so those hours keep running.
+        Testing ends when all hours have stopped, when the stopped hours alone
+        already make the week not significant, or when num_permutations is
+        reached. The number of permutations used is stored in self.num_used.
         """
-        nump = len(pvector)
-        greater_count = 0
-        for i in range(nump):
-            if pvector[i] >= distance:
-                greater_count += 1
-        return float(greater_count) / float(nump)
-
-    def permutation_change(self, w1, w2):
+        num_hours = len(distance)
+        exceedances = np.zeros(num_hours)
+        counts = np.zeros(num_hours)
+        settled = np.zeros(num_hours, dtype=bool)
+        n = 0
+        while n < self.num_permutations and not np.all(settled):
+            batch = min(self.batch_size, self.num_permutations - n)
+            new_distance = self.permutation_distances(
+                data, self.permutation_indices(2 * num_days, rng, batch), num_days)
+            n += batch
+            exceedances[~settled] += np.sum(new_distance >= distance, axis=0)[~settled]
+            counts[~settled] = n
+            lower = self.wilson_interval(exceedances, counts, self.confidence_z)[0]
+            settled |= (exceedances >= self.min_exceedances) | (lower > cutoff)
+            # best case for the week: every running hour ends with p-value 0
+            best_p_vals = np.where(settled, exceedances / counts, 0.0)
+            if self.normalize_change_score(best_p_vals, cutoff, self.num_permutations) < 0.95:
+                break
+        self.num_used = n
+        return exceedances / counts
+
+    def permutation_change(self, w1, w2, rng=None):
         """ Small-window Permutation-based Change Detection in Activity Routine.
+        Permutations are drawn from the np.random.Generator rng. In adaptive
+        mode the number of permutations depends on how quickly the hourly
+        p-values settle (see adaptive_p_values).
         """
+        if rng is None:
+            rng = np.random.default_rng(self.seed)
         permute_days_cutoff = 0.05
         num_days = 7
 
         # collapse week into single average day
-        baseline_df = np.apply_along_axis(np.sum, 0, w1)
-        curr_df = np.apply_along_axis(np.sum, 0, w2)
+        baseline_df = np.sum(w1, axis=0)
+        curr_df = np.sum(w2, axis=0)
 
-        baseline_distance = np.zeros(24)
         # compute hourly day change based on symmetric Kullback-Leibler divergence
-        for i in range(24):
-            baseline_distance[i] = self.kl_divergence(baseline_df[i], curr_df[i])
+        baseline_distance = self.kl_divergence_batch(baseline_df, curr_df)
 
-        p_vals = list()
         data = np.concatenate((w1, w2), axis=0)
-        # compute pairwise day change for shuffled days
-        new_distance = np.zeros((self.num_permutations, 24))
-        for i in range(self.num_permutations):
-            shuffle_inds = np.random.permutation(2 * num_days)
-            first_half = data[shuffle_inds[:num_days]]
-            second_half = data[shuffle_inds[-num_days:]]
-            first_df = np.apply_along_axis(np.sum, 0, first_half)
-            second_df = np.apply_along_axis(np.sum, 0, second_half)
-            # compute change based on symmetric Kullback-Leibler divergence
-            for j in range(24):
-                new_distance[i][j] = self.kl_divergence(p=first_df[j],
-                                                        q=second_df[j])
-        for i in range(self.num_permutations):
-            for j in range(24):
-                p_val = self.test_permute_days_significance(
-                    pvector=new_distance[:, j],
-                    distance=baseline_distance[j],
-                    permute_days_cutoff=permute_days_cutoff)
-                p_vals.append(p_val)
+        repeats = self.num_permutations
+        if self.permutation_mode == 'adaptive':
+            p_vals = self.adaptive_p_values(data, baseline_distance, num_days,
+                                            permute_days_cutoff, rng)
+        elif self.permutation_mode == 'exact':
+            # compute day change for every split of the days, no sampling
+            new_distance = self.exact_distances(data, num_days)
+            p_vals = self.permutation_p_values(new_distance, baseline_distance)
+            self.num_used = 2 * len(new_distance)
+            repeats = self.num_used
+        else:
+            # compute pairwise day change for shuffled days
+            new_distance = self.random_distances(data, num_days, rng)
+            p_vals = self.permutation_p_values(new_distance, baseline_distance)
+            self.num_used = self.num_permutations
 
+        # each hour's p-value counts once per permutation, so the mean over
+        # all of them is the mean of the hourly p-values
         cs = 1.0 - np.absolute(np.mean(p_vals))
         results = self.normalize_change_score(p_vals=p_vals,
-                                              alpha_star=permute_days_cutoff)
+                                              alpha_star=permute_days_cutoff,
+                                              repeats=repeats)
         if results >= 0.95:
             is_sig = 1
         else:
@@ -200,17 +337,20 @@ class BCD:
                         data[i][j][k] = (data[i][j][k] - min_value) / diff
         return data
 
-    def compute_change_scores(self, days1, days2, hours1, hours2):
+    def compute_change_scores(self, days1, days2, hours1, hours2, rng=None):
         """ Compute change scores using one or more measures.
         Currently employs small-window Permutation Change.
         """
-        cs1, is_sig1 = self.permutation_change(hours1, hours2)
+        cs1, is_sig1 = self.permutation_change(hours1, hours2, rng)
         return cs1, is_sig1
 
     def check_trend(self, daydata, flat_hourdata, hourdata):
         """ Compute change between first week (baseline) and all following weeks.
+        Each week draws its permutations from its own generator, spawned from
+        a single SeedSequence, so the results do not depend on the order in
+        which weeks are processed. With more than one worker the weeks are
+        compared in a process pool and the results match a serial run.
         """
-        results = list()
         daydata = self.normalize_daydata(daydata)
         hourdata = self.normalize_hourdata(flat_hourdata, hourdata)
         numdays = len(daydata)
@@ -219,18 +359,20 @@ class BCD:
 
         # trim first day because it may be incomplete
         baseline_week_hourdata = hourdata[:7, :]
+        seeds = np.random.SeedSequence(self.seed).spawn(numweeks)
+        weeks = list()
         for i in range(numweeks):
             start = i * 7
             stop = i * 7 + 7
-            compare_week_daydata = daydata[start:stop, :]
-            k = len(hourdata[0][0])
-            compare_week_hourdata = hourdata[start:stop, :]
-            cs, is_sig = self.compute_change_scores(baseline_week_daydata,
-                                                    compare_week_daydata,
-                                                    baseline_week_hourdata,
-                                                    compare_week_hourdata)
-            results.append((cs, is_sig))
-        return results
+            weeks.append((baseline_week_daydata, daydata[start:stop, :],
+                          baseline_week_hourdata, hourdata[start:stop, :], seeds[i]))
+        if self.num_workers > 1 and numweeks > 1:
+            with ProcessPoolExecutor(max_workers=self.num_workers) as executor:
+                week_results = list(executor.map(compare_week, [self] * numweeks, weeks))
+        else:
+            week_results = [compare_week(self, week) for week in weeks]
+        self.permutations_used = [num_used for cs, is_sig, num_used in week_results]
+        return [(cs, is_sig) for cs, is_sig, num_used in week_results]
 
     def bcd(self, daydata, hourdata):
         """ Perform behavioral change detection.
@@ -239,11 +381,39 @@ class BCD:
         numfeatures = len(hourdata[0])
         reshaped_hourdata = np.reshape(hourdata, (numdays, 24, numfeatures))
         if len(daydata) < 8:
+            self.permutations_used = [0]
             return [(0, 0)]
         else:
             return self.check_trend(daydata, hourdata, reshaped_hourdata)
 
 
+@functools.lru_cache(maxsize=None)
+def split_indices(num_shuffled, num_days):
+    """ Generate one row per way of choosing num_days of num_shuffled days
+    as the first half, keeping only the choices that include day 0 (the rest
+    are their complements). Each row lists the days of the first half in
+    increasing order, followed by the days of the second half. For two weeks
+    this covers all C(14, 7) = 3432 splits with 1716 rows. The matrix is
+    computed once per process and shared by all weeks.
+    """
+    splits = np.array([c + tuple(sorted(set(range(num_shuffled)) - set(c)))
+                       for c in itertools.combinations(range(num_shuffled), num_days)
+                       if c[0] == 0])
+    splits.setflags(write=False)
+    return splits
+
+
+def compare_week(bcd_obj, week):
+    """ Compute the change score of one week. The input week holds the baseline
+    and compared day and hour data together with the week's SeedSequence.
+    The number of permutations used is returned with the score.
+    """
+    days1, days2, hours1, hours2, seed = week
+    cs, is_sig = bcd_obj.compute_change_scores(days1, days2, hours1, hours2,
+                                               np.random.default_rng(seed))
+    return cs, is_sig, bcd_obj.num_used
+
+
 def main(bcd_obj, main_days_infile, main_hours_infile):
     """ Load day and hour statistics from files. Use these values to perform
     behavioral change detection.
@@ -0,0 +1,303 @@
+#!/usr/bin/python
+
+# python benchmark.py [options]
+#
+# Measure the run time of each stage of DM on synthetic sensor data.
+#
+# The data are generated with a daily activity schedule, GPS trajectories
+# between the places of a synthetic locations file, and gaps in recording.
+# Each stage (downsample, impute_values, label_locations, hour_stats,
+# day_stats, behavior_stats, bcd) is timed separately for every requested
+# number of days, and the timings are written to a json report.
+
+# Copyright (c) 2020. Washington State University (WSU). All rights reserved.
+# Code and data may not be used or distributed without permission from WSU.
+
+
+import json
+import os.path
+import platform
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+import bcd
+import bstats
+import config
+import daystats
+import downsample
+import hourstats
+import impute
+import loc
+
+begin_date = 18000  # first day of synthetic data, days since 1970-01-01
+
+# place visited during each activity, and the location type of the place as
+# written to the locations file; l.translate maps these types to distinct
+# location indices (house, work, service, road, other, restaurant)
+activity_places = {'Errands': 'store', 'Exercise': 'trail', 'Hobby': 'theatre',
+                   'Housework': 'home', 'Hygiene': 'home', 'Mealtime': 'home',
+                   'Other': 'home', 'Relax': 'home', 'Sleep': 'home',
+                   'Socialize': 'restaurant', 'Travel': None, 'Work': 'office'}
+place_types = {'home': 'home', 'office': 'office', 'store': 'supermarket',
+               'trail': 'footway', 'theatre': 'theatre',
+               'restaurant': 'restaurant'}
+
+# standard deviation of the motion sensors during each activity
+activity_intensity = {'Errands': 0.6, 'Exercise': 2.0, 'Hobby': 0.5,
+                      'Housework': 0.8, 'Hygiene': 0.4, 'Mealtime': 0.3,
+                      'Other': 0.4, 'Relax': 0.2, 'Sleep': 0.05,
+                      'Socialize': 0.4, 'Travel': 1.0, 'Work': 0.3}
+
+
+def generate_places(rng, center=(46.73, -117.16)):
+    """ Place the home, office and other places at random around a center.
+    Return a dictionary from place name to (latitude, longitude).
+    """
+    places = dict()
+    for name in place_types:
+        offset = rng.uniform(-0.05, 0.05, size=2)
+        places[name] = (center[0] + offset[0], center[1] + offset[1])
+    return places
+
+
+def write_locations(filename, places):
+    """ Write a locations file with one line per place, in the format read by
+    loc.Location.read_locations.
+    """
+    with open(filename, "w") as file:
+        for name, (latitude, longitude) in places.items():
+            file.write(str(round(latitude, 6)) + ' ' + str(round(longitude, 6)) + ' ' +
+                       place_types[name] + ' synthetic ' + name + '\n')
+
+
+def day_schedule(rng, weekend):
+    """ Generate the activities of one day as a list of (activity, minutes)
+    pairs that add up to 1440 minutes.
+    """
+    wake = int(rng.normal(420, 30))
+    if weekend:
+        outing = rng.choice(['Errands', 'Exercise', 'Hobby', 'Socialize'])
+        schedule = [('Sleep', wake), ('Hygiene', 30), ('Mealtime', 40),
+                    ('Housework', int(rng.uniform(60, 180))), ('Travel', 20),
+                    (outing, int(rng.uniform(90, 240))), ('Travel', 20),
+                    ('Relax', int(rng.uniform(60, 180))), ('Mealtime', 45),
+                    ('Hobby', int(rng.uniform(30, 120)))]
+    else:
+        schedule = [('Sleep', wake), ('Hygiene', 30), ('Mealtime', 20),
+                    ('Travel', int(rng.uniform(15, 40))),
+                    ('Work', int(rng.normal(480, 40))),
+                    ('Travel', int(rng.uniform(15, 40)))]
+        if rng.random() < 0.3:
+            schedule += [('Errands', int(rng.uniform(20, 60))), ('Travel', 15)]
+        if rng.random() < 0.3:
+            schedule += [('Exercise', int(rng.uniform(30, 90))), ('Travel', 15)]
+        schedule += [('Mealtime', 45), ('Relax', int(rng.uniform(60, 180))),
+                     ('Housework', 30)]
+    used = sum(minutes for activity, minutes in schedule)
+    schedule.append(('Sleep', max(0, 1440 - used)))
+    return schedule
+
+
+def generate_minutes(numdays, rng, places, cf):
+    """ Generate numdays days of minute data, one row per minute in the
+    52-column input format with the time in seconds past midnight.
+    """
+    rows = np.zeros((numdays * cf.minutes_in_day, cf.activity_pos + 1))
+    minute = np.arange(len(rows))
+    rows[:, cf.date] = begin_date + minute // cf.minutes_in_day
+    rows[:, cf.time] = (minute % cf.minutes_in_day) * 60.0
+    activities = np.zeros(len(rows), dtype=int)
+    latitudes = np.zeros(len(rows))
+    longitudes = np.zeros(len(rows))
+    for day in range(numdays):
+        schedule = day_schedule(rng, (begin_date + day) % 7 in (2, 3))
+        start = day * cf.minutes_in_day
+        place = places['home']
+        for i, (activity, minutes) in enumerate(schedule):
+            minutes = min(minutes, (day + 1) * cf.minutes_in_day - start)
+            if minutes <= 0:
+                break
+            end = start + minutes
+            activities[start:end] = cf.activity_list.index(activity)
+            if activity_places[activity] is not None:
+                place = places[activity_places[activity]]
+                latitudes[start:end] = place[0]
+                longitudes[start:end] = place[1]
+            else:  # travel from the current place to the next one
+                following = 'home'
+                for next_activity, next_minutes in schedule[i + 1:]:
+                    if activity_places[next_activity] is not None:
+                        following = activity_places[next_activity]
+                        break
+                fraction = np.linspace(0.0, 1.0, minutes)
+                latitudes[start:end] = place[0] + fraction * (places[following][0] - place[0])
+                longitudes[start:end] = place[1] + fraction * (places[following][1] - place[1])
+            start = end
+    intensity = np.array([activity_intensity[name] for name in cf.activity_list])
+    scale = intensity[activities][:, np.newaxis]
+    rows[:, cf.yaw:cf.latitude] = rng.normal(size=(len(rows), 9)) * scale
+    rows[:, cf.latitude] = latitudes + rng.normal(0, 0.0002, len(rows))
+    rows[:, cf.longitude] = longitudes + rng.normal(0, 0.0002, len(rows))
+    rows[:, cf.altitude] = 780.0 + rng.normal(0, 2.0, len(rows))
+    travel = activities == cf.activity_list.index('Travel')
+    rows[:, cf.course] = np.where(travel, rng.uniform(0, 360, len(rows)), -1.0)
+    rows[:, cf.speed] = np.where(travel, rng.normal(12, 3, len(rows)), 0.0)
+    rows[:, cf.horizontal_accuracy] = rng.uniform(5, 65, len(rows))
+    rows[:, cf.vertical_accuracy] = rng.uniform(3, 10, len(rows))
+    oneclass = np.arange(cf.num_activities) % len(cf.activity_list)
+    rows[:, cf.oneclass_pos:cf.activity_pos] = oneclass == activities[:, np.newaxis]
+    rows[:, cf.activity_pos] = activities
+    return rows
+
+
+def add_gaps(rows, rng, cf, gaps_per_day=1.5, mean_gap=45, missing_day_rate=0.02):
+    """ Remove minutes from the data to mimic gaps in recording: a Poisson
+    number of gaps per day with exponentially distributed lengths, and a few
+    whole days without data. The first and last minutes are always kept.
+    """
+    numdays = len(rows) // cf.minutes_in_day
+    keep = np.ones(len(rows), dtype=bool)
+    for day in range(numdays):
+        start = day * cf.minutes_in_day
+        if 0 < day < numdays - 1 and rng.random() < missing_day_rate:
+            keep[start:start + cf.minutes_in_day] = False
+            continue
+        for gap in range(rng.poisson(gaps_per_day)):
+            first = start + rng.integers(0, cf.minutes_in_day)
+            keep[first:first + int(rng.exponential(mean_gap)) + 1] = False
+    keep[0] = keep[-1] = True
+    return rows[keep]
+
+
+def expand_raw(minutes, rng, cf, rate=downsample.original_sample_rate):
+    """ Expand minute data to rate samples per minute, adding noise to the
+    motion sensors of each sample.
+    """
+    raw = np.repeat(minutes, rate, axis=0)
+    raw[:, cf.time] += np.tile(np.arange(rate) * (60.0 / rate), len(minutes))
+    raw[:, cf.yaw:cf.latitude] += rng.normal(0, 0.1, size=(len(raw), 9))
+    return raw
+
+
+def timed(report, stage, rows, function, *args):
+    """ Run function(*args), add its wall time and number of input rows to
+    the report under the stage name, and return its result.
+    """
+    start = time.perf_counter()
+    result = function(*args)
+    report[stage] = {'seconds': time.perf_counter() - start, 'rows': int(rows)}
+    return result
+
+
+def run_benchmark(numdays, rng, cf, location, places, raw_days=1,
+                  rate=downsample.original_sample_rate):
+    """ Generate numdays days of synthetic data and time each stage of DM.
+    Downsampling is timed on raw data for the first raw_days days only,
+    because raw data at the full sample rate is large.
+    """
+    stages = dict()
+    minutes = add_gaps(generate_minutes(numdays, rng, places, cf), rng, cf)
+    raw_rows = minutes[minutes[:, cf.date] < begin_date + min(raw_days, numdays)]
+    raw = expand_raw(raw_rows, rng, cf, rate)
+    timed(stages, 'downsample', len(raw), downsample.downsample, raw)
+    del raw
+    data = downsample.downsample(minutes)
+    data, missing, counts = timed(stages, 'impute_values', len(data),
+                                  impute.impute_values, data, None, True)
+    locarray = timed(stages, 'label_locations', len(data), location.label_locations,
+                     data[:, cf.latitude], data[:, cf.longitude])
+    hour_values = timed(stages, 'hour_stats', len(data), hourstats.HourStats().hour_stats,
+                        data, location, locarray, missing)
+    day_values = timed(stages, 'day_stats', len(data), daystats.DayStats().day_stats,
+                       data, location, locarray, hour_values, counts)
+    timed(stages, 'behavior_stats', len(hour_values),
+          bstats.BehaviorStats().behavior_stats, day_values, hour_values)
+    change = bcd.BCD(cf.seed, cf.bcd_workers)
+    change.permutation_mode = cf.bcd_mode
+    timed(stages, 'bcd', len(day_values), change.bcd, day_values, hour_values)
+    return {'days': numdays, 'observed_minutes': len(minutes),
+            'raw_days': min(raw_days, numdays), 'sample_rate': rate,
+            'total_seconds': sum(stage['seconds'] for stage in stages.values()),
+            'stages': stages}
+
+
+def write_files(path, numdays, rng, cf, places, raw_days, rate):
+    """ Write a synthetic locations file, a minute file of numdays days and a
+    raw file of raw_days days to path, so they can be given to dm.py.
+    """
+    os.makedirs(path, exist_ok=True)
+    write_locations(os.path.join(path, 'locations'), places)
+    minutes = add_gaps(generate_minutes(numdays, rng, places, cf), rng, cf)
+    np.savetxt(os.path.join(path, 'synthetic_' + str(numdays) + 'd.minutes'),
+               minutes, delimiter=',', fmt='%.6f')
+    raw_rows = minutes[minutes[:, cf.date] < begin_date + min(raw_days, numdays)]
+    np.savetxt(os.path.join(path, 'synthetic_' + str(raw_days) + 'd.raw'),
+               expand_raw(raw_rows, rng, cf, rate), delimiter=',', fmt='%.6f')
+
+
+def main():
+    cf = config.Config()
+    day_counts = [1, 7, 30]
+    raw_days = 1
+    rate = downsample.original_sample_rate
+    seed = 0
+    outfile = 'benchmark.json'
+    path = None
+    args = sys.argv
+    index = 1
+    while index < len(args):
+        option = args[index]
+        if option == "--days":
+            index += 1
+            day_counts = [int(value) for value in args[index].split(',')]
+        elif option == "--raw_days":
+            index += 1
+            raw_days = int(args[index])
+        elif option == "--rate":
+            index += 1
+            rate = int(args[index])
+        elif option == "--seed":
+            index += 1
+            seed = int(args[index])
+        elif option == "--output":
+            index += 1
+            outfile = args[index]
+        elif option == "--write":
+            index += 1
+            path = args[index]
+        elif option == "--bcd_mode":
+            index += 1
+            cf.bcd_mode = config.check_bcd_mode(args[index])
+        index += 1
+    cf.seed = seed
+    rng = np.random.default_rng(seed)
+    places = generate_places(rng)
+    if path is not None:
+        write_files(path, max(day_counts), rng, cf, places, raw_days, rate)
+        print('Wrote synthetic data to', path)
+        return
+    results = list()
+    with tempfile.TemporaryDirectory() as tmpdir:
+        locfile = os.path.join(tmpdir, 'locations')
+        write_locations(locfile, places)
+        location = loc.Location(locfile)
+        location.read_location_mappings()
+        location.read_locations()
+        for numdays in day_counts:
+            result = run_benchmark(numdays, rng, cf, location, places, raw_days,
+                                   rate)
+            print(numdays, 'days:', ', '.join(name + ' ' + str(round(stage['seconds'], 3))
+                                              for name, stage in result['stages'].items()))
+            results.append(result)
+    report = {'python': platform.python_version(), 'numpy': np.__version__,
+              'machine': platform.machine(), 'seed': seed, 'bcd_mode': cf.bcd_mode,
+              'results': results}
+    with open(outfile, "w") as file:
+        json.dump(report, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -17,6 +17,7 @@ import numpy as np
 
 import config
 import features
+import markerschema
 
 
 class BehaviorStats:
@@ -24,162 +25,102 @@ class BehaviorStats:
     def __init__(self):
         """ Constructor
         """
+        self.spectral_bands = list()  # (low, high) bands in cycles per day
 
     @staticmethod
     def twod_features(data, means, medians, stds):
-        """ Generate markers from 2D features.
+        """ Generate markers from 2D features. Each marker is computed for
+        every column of data at once and returned as a vector with one value
+        per column.
         """
-        zc = np.empty_like(means)
-        mc = np.empty_like(means)
-        iqr = np.empty_like(means)
-        skew = np.empty_like(means)
-        k = np.empty_like(means)
-        for i in range(len(data[0])):
-            zc = features.zero_crossings(data[:, i], medians[i])
-            mc = features.mean_crossings(data[:, i], means[i])
-            iqr = features.interquartile_range(data[:, i])
-            skew = features.skewness(data[:, i], means[i])
-            k = features.kurtosis(data[:, i], means[i], stds[i])
+        columns = np.asarray(data, dtype=float).T
+        zc = features.crossings_batch(columns, medians)
+        mc = features.crossings_batch(columns, means)
+        iqr = features.interquartile_range_batch(columns)
+        skew = features.skewness_batch(columns, means)
+        k = features.kurtosis_batch(columns, means, stds)
         return zc, mc, iqr, skew, k
 
     @staticmethod
     def normalize(data):
-        """ Normalize input data to fall in range [-0.5, 0.5].
+        """ Normalize each column of input data to fall in range [-0.5, 0.5].
+        Constant columns map to -0.5.
         """
-        minvalue = np.min(data)
-        maxvalue = np.max(data)
-        valrange = maxvalue - minvalue
-        vals = np.zeros(len(data))
-        for i in range(len(data)):
-            if valrange == 0.0:
-                vals[i] = -0.5
-            else:
-                vals[i] = ((data[i] - minvalue) / valrange) - 0.5
-        return vals
+        data = np.asarray(data, dtype=float)
+        minvalue = np.min(data, axis=0)
+        valrange = np.max(data, axis=0) - minvalue
+        scale = np.where(valrange == 0.0, 1.0, valrange)
+        return np.where(valrange == 0.0, -0.5, (data - minvalue) / scale - 0.5)
 
     @staticmethod
-    def compute_new_days(new_days, days):
-        """ Aggregate multiple weeks by computing the means of a feature
-        for each day of the week.
+    def compute_new_days(days):
+        """ Aggregate multiple weeks by computing the means of each feature
+        for each day of the week. days is a (days, 24, features) array and the
+        result is a (7, 24, features) array, zero for days of the week with no
+        data.
         (date mod 7) == 0 F, 1 Sa, 2 Su, 3 M, 4 Tu, 5 W, 6 Th
         """
-        if len(days[3::7]) > 0:  # Friday
-            new_days[0] = np.apply_along_axis(np.mean, 0, days[3::7])
-        else:
-            new_days[0] = 0.0
-        if len(days[4::7]) > 0:  # Saturday
-            new_days[1] = np.apply_along_axis(np.mean, 0, days[4::7])
-        else:
-            new_days[1] = 0.0
-        if len(days[5::7]) > 0:  # Sunday
-            new_days[2] = np.apply_along_axis(np.mean, 0, days[5::7])
-        else:
-            new_days[2] = 0.0
-        if len(days[6::7]) > 0:  # Monday
-            new_days[3] = np.apply_along_axis(np.mean, 0, days[6::7])
-        else:
-            new_days[3] = 0.0
-        if len(days[0::7]) > 0:  # Tuesday
-            new_days[4] = np.apply_along_axis(np.mean, 0, days[0::7])
-        else:
-            new_days[4] = 0.0
-        if len(days[1::7]) > 0:  # Wednesday
-            new_days[5] = np.apply_along_axis(np.mean, 0, days[1::7])
-        else:
-            new_days[5] = 0.0
-        if len(days[2::7]) > 0:  # Thursday
-            new_days[6] = np.apply_along_axis(np.mean, 0, days[2::7])
-        else:
-            new_days[6] = 0.0  # default
+        new_days = np.zeros((7,) + days.shape[1:])
+        for i, offset in enumerate([3, 4, 5, 6, 0, 1, 2]):
+            if len(days[offset::7]) > 0:
+                new_days[i] = np.mean(days[offset::7], axis=0)
         return new_days
 
     @staticmethod
-    def ri_formula(ri_x, ri_y):
-        """ Apply regularity index formula to a pair of features.
+    def ri_formula(ri_x):
+        """ Apply regularity index formula to every pair of rows of ri_x, an
+        (..., rows, 24) array, returning the (..., rows, rows) Gram matrices
+        divided by 24.
         """
-        ri = 0.0
-        for x, y in zip(ri_x, ri_y):
-            ri += x * y
-        ri /= 24.0
-        return ri
+        return np.matmul(ri_x, np.swapaxes(ri_x, -1, -2)) / 24.0
 
-    def regularity(self, feature):
-        """ Compute regularity index for a single feature.
+    @staticmethod
+    def mean_off_diagonal(gram):
+        """ Mean of the off-diagonal entries of each (n, n) matrix in gram.
+        """
+        num = gram.shape[-1]
+        total = np.sum(gram, axis=(-2, -1)) - np.trace(gram, axis1=-2, axis2=-1)
+        return total / (num * (num - 1))
+
+    def regularity(self, hourdata):
+        """ Compute regularity index for each feature (column) of hourdata.
         The regularity between day a and b is defined as
         Sum_{t-1}^T feature(day a, time t) * feature(day b, time t) / T,
         where T = 24 hours.
         The data are first normalized to lie in the range [-0.5,0.5].
+        Returns a (features, 9) array: regularity within the week, within
+        weekdays, and between weeks for each of the 7 days of the week. The
+        between weeks values are running means over the days so far.
         """
-        data = self.normalize(feature)
-        numdays = int(len(feature) // 24)
-        hours_in_a_week = 168
+        data = self.normalize(hourdata)
+        numdays = int(len(data) // 24)
         numweeks = int(numdays // 7)
-        vals = list()
+        numfeatures = data.shape[1]
+        vals = np.zeros((numfeatures, 9))
 
-        # break data into individual days
-        days = [data[i * 24:(i + 1) * 24] for i in range((len(data) + 23) // 24)]
-        new_days = [[0.0 for j in range(24)] for i in range(7)]
-        new_days = self.compute_new_days(new_days, days)
+        # break data into individual days, one (24 x features) slice per day
+        days = data[:numdays * 24].reshape(numdays, 24, numfeatures)
+        new_days = self.compute_new_days(days)
 
-        # pairs within week
-        indices = list()
-        for i in range(7):
-            for j in range(7):
-                if i != j:
-                    try:
-                        if len(new_days[i]) != 0 and len(new_days[j]) != 0:
-                            indices.append(self.ri_formula(new_days[i], new_days[j]))
-                        else:
-                            indices.append(0.0)
-                    except:
-                        indices.append(0.0)
-        vals.append(np.mean(indices))
-
-        # pairs within weekdays
-        indices = list()
-        for i in range(5):
-            for j in range(5):
-                if i != j:
-                    try:
-                        if len(new_days[i]) != 0 and len(new_days[j]) != 0:
-                            indices.append(self.ri_formula(new_days[i], new_days[j]))
-                        else:
-                            indices.append(0.0)
-                    except:
-                        indices.append(0.0)
-        vals.append(np.mean(indices))
+        # pairs within week and within weekdays
+        gram = self.ri_formula(new_days.transpose(2, 0, 1))
+        vals[:, 0] = self.mean_off_diagonal(gram)
+        vals[:, 1] = self.mean_off_diagonal(gram[:, :5, :5])
 
         # pairs between weeks
-        indices = list()
-        if numweeks < 2:
-            for i in range(7):
-                vals.append(0.0)
-        else:
-            for i in range(7):
-                group_days = days[i::7]
-                for j in range(numweeks):
-                    for k in range(numweeks):
-                        if j != k:
-                            try:
-                                if len(group_days[j]) != 0 and len(group_days[k]) != 0:
-                                    indices.append(self.ri_formula(group_days[j], group_days[k]))
-                                else:
-                                    indices.append(0.0)
-                            except:
-                                indices.append(0.0)
-                vals.append(np.mean(indices))
+        if numweeks >= 2:
+            weeks = days[:numweeks * 7].reshape(numweeks, 7, 24, numfeatures)
+            gram = self.ri_formula(weeks.transpose(1, 3, 0, 2))
+            between = np.cumsum(self.mean_off_diagonal(gram), axis=0)
+            vals[:, 2:] = (between / np.arange(1, 8)[:, np.newaxis]).T
         return vals
 
     def regularity_index(self, hourdata):
         """ Compute regularity index for continuous-valued features based on
         formula found in Wang et al., IMWUT, 2018.
-        Do not compute for date, time, or activity.
+        The nine regularity values are computed for every hour feature.
         """
-        ri = []
-        for i in range(3):
-            vals = np.apply_along_axis(self.regularity, 0, hourdata[:, i])
-            ri = np.append(ri, vals)
-        return ri
+        return self.regularity(hourdata).ravel()
 
     @staticmethod
     def circadian_rhythm(data):
@@ -199,59 +140,73 @@ class BehaviorStats:
         """ Compute circadian rhythm of individual features based on hour data.
         Do not compute for activity, location, or missing indicator.
         """
-        cr = list()
-        for i in range(3):
-            vals = np.apply_along_axis(self.circadian_rhythm, 0, hourdata[:, i])
-            cr = np.append(cr, vals)
-        return cr
+        return np.array([self.circadian_rhythm(hourdata[:, i])
+                         for i in range(markerschema.num_circadian_features)])
 
-    def extract_component_features(self, data):
+    def spectral_features(self, hourdata):
+        """ Compute the dominant frequency of each hour feature over the whole
+        recording and its power in each spectral band. The hour data has 24
+        samples per day, so frequencies are in cycles per day.
+        """
+        columns = np.asarray(hourdata, dtype=float).T
+        return features.spectral_features_batch(columns, sample_rate=24.0,
+                                                bands=self.spectral_bands)
+
+    def extract_component_features(self, data, out=None):
         """ Compute statistics for each individual feature.
+        The output holds one block per statistic (mean, median, std, max, min,
+        zc, mc, iqr, skew, kurtosis, signal energy), each with one value per
+        feature. If out is given, the statistics are written into it.
         """
-        new_data = list()
-        means = np.apply_along_axis(np.mean, 0, data)
-        new_data = np.append(new_data, means)
-        medians = np.apply_along_axis(np.median, 0, data)
-        new_data = np.append(new_data, medians)
-        stds = np.apply_along_axis(np.std, 0, data)
-        new_data = np.append(new_data, stds)
-        maxes = np.apply_along_axis(np.max, 0, data)
-        new_data = np.append(new_data, maxes)
-        mins = np.apply_along_axis(np.min, 0, data)
-        new_data = np.append(new_data, mins)
-        if len(data) == 1:  # only one time unit of data
-            k = len(data[0])
-            for i in range(k + 5):
-                new_data = np.append(new_data, 0.0)  # zc, mc, iqr, skew, k, se
+        data = np.asarray(data, dtype=float)
+        k = data.shape[1]
+        num_stats = len(markerschema.component_stats)
+        if out is None:
+            out = np.zeros(num_stats * k)
         else:
-            zc, mc, iqr, skew, k = self.twod_features(data, means, medians, stds)
-            new_data = np.append(new_data, zc)
-            new_data = np.append(new_data, mc)
-            new_data = np.append(new_data, iqr)
-            new_data = np.append(new_data, skew)
-            new_data = np.append(new_data, k)
-            se = np.apply_along_axis(features.signal_energy, 0, data)
-            new_data = np.append(new_data, se)
-        return new_data
-
-    def behavior_stats(self, daydata, hourdata):
+            out[:] = 0.0
+        blocks = out.reshape(num_stats, k)
+        blocks[0] = np.mean(data, axis=0)
+        blocks[1] = np.median(data, axis=0)
+        blocks[2] = np.std(data, axis=0)
+        blocks[3] = np.max(data, axis=0)
+        blocks[4] = np.min(data, axis=0)
+        if len(data) > 1:  # leave zc, mc, iqr, skew, k, se at 0 for one time unit
+            blocks[5:10] = self.twod_features(data, blocks[0], blocks[1], blocks[2])
+            blocks[10] = np.sum(data * data, axis=0)
+        return out
+
+    def behavior_stats(self, daydata, hourdata, accumulators=None):
         """ Extract digital behavior markers.
         Markers extracted from day and hour features:
         mean, median, standard deviation, zero crossings, mean crossings,
         interquartile range, skewness, kurtosis, signal energy
-        regularity within week / between weeks / overall, circadian rhythm
+        regularity within week / between weeks / overall, circadian rhythm,
+        and, if spectral_bands is set, dominant frequency and band power
+        If accumulators holds the accumulate.ComponentAccumulator of the day
+        and hour data (for example, merged from separately processed shards),
+        the per-feature statistics are taken from them instead of being
+        computed from the tables. Medians, interquartile ranges and crossings
+        are then exact up to accumulate.sketch_size rows and approximate beyond.
         """
-        new_data = []
-        new_data = np.append(new_data, self.extract_component_features(daydata))
-        new_data = np.append(new_data, self.extract_component_features(hourdata))
-        if len(daydata) == 1:
-            for i in range(12):
-                new_data = np.append(new_data, 0.0)
+        schema = markerschema.behavior_schema(spectral_bands=self.spectral_bands)
+        new_data = schema.allocate()
+        day_out = schema.span(new_data, 'mean_day', 'sig_day')
+        hour_out = schema.span(new_data, 'mean_hour', 'sig_hour')
+        if accumulators is None:
+            self.extract_component_features(daydata, day_out)
+            self.extract_component_features(hourdata, hour_out)
         else:
-            ri = self.regularity_index(hourdata)
-            new_data = np.append(new_data, ri)
-            cr = self.circadian_rhythm_features(hourdata)
-            new_data = np.append(new_data, cr)
+            accumulators[0].component_features(day_out)
+            accumulators[1].component_features(hour_out)
+        if len(daydata) > 1:  # leave regularity and circadian rhythm at 0 for one day
+            schema.block(new_data, 'ri')[:] = self.regularity_index(hourdata)
+            schema.block(new_data, 'cr')[:] = self.circadian_rhythm_features(hourdata)
+        if self.spectral_bands:
+            dominant, band_power = self.spectral_features(hourdata)
+            schema.block(new_data, 'dom_hour')[:] = dominant
+            for b in range(len(self.spectral_bands)):
+                schema.block(new_data, 'band' + str(b + 1) + '_hour')[:] = band_power[:, b]
         return new_data
 
 
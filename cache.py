@@ -0,0 +1,58 @@
+#!/usr/bin/python
+
+# Stores imputed minute data in binary files, so that repeated runs on the
+# same input do not parse, downsample and impute it again.
+
+# Copyright (c) 2020. Washington State University (WSU). All rights reserved.
+# Code and data may not be used or distributed without permission from WSU.
+
+
+import hashlib
+import os.path
+
+import numpy as np
+
+cache_version = 1  # increase when the downsampled or imputed data change
+
+
+def cache_key(infile, cf):
+    """ Compute the key of the cached matrices for an input file. The key is a
+    hash of the file contents together with the cache version and the
+    configuration values that change the imputed data.
+    """
+    digest = hashlib.sha256()
+    with open(infile, "rb") as file:
+        for block in iter(lambda: file.read(1 << 20), b''):
+            digest.update(block)
+    fields = (cache_version, cf.num_sensors, cf.num_activities, cf.activity_pos,
+              cf.missing_value_pos, cf.minutes_in_day, tuple(cf.activity_list))
+    digest.update(repr(fields).encode())
+    return digest.hexdigest()
+
+
+def cache_filename(cachepath, key, name):
+    """ Return the name of the file that holds one cached matrix.
+    """
+    return os.path.join(cachepath, key + '.' + name + '.npy')
+
+
+def load_matrix(cachepath, key, name):
+    """ Load a cached matrix as a read-only memory map, or return None if the
+    matrix is not in the cache.
+    """
+    filename = cache_filename(cachepath, key, name)
+    if not os.path.isfile(filename):
+        return None
+    return np.load(filename, mmap_mode='r')
+
+
+def save_matrix(cachepath, key, name, data):
+    """ Store a matrix in the cache. The file is written under a temporary
+    name and then renamed, so a partial file is never loaded.
+    """
+    os.makedirs(cachepath, exist_ok=True)
+    filename = cache_filename(cachepath, key, name)
+    tmpname = filename + '.' + str(os.getpid()) + '.tmp'
+    with open(tmpname, "wb") as file:
+        np.save(file, np.ascontiguousarray(data))
+    os.replace(tmpname, filename)
@@ -7,6 +7,19 @@
 # Code and data may not be used or distributed without permission from WSU.
 
 
+import sys
+
+# index value of each location type, any other type maps to 'other'
+location_nums = {'attraction': 0, 'house': 1, 'restaurant': 2, 'road': 3,
+                 'service': 4, 'store': 5, 'work': 6, 'other': 7}
+
+# location types in the order of their location index
+location_names = sorted(location_nums, key=location_nums.get)
+
+# permutation testing modes of behavior change detection (see bcd.BCD)
+bcd_modes = ['random', 'adaptive', 'exact']
+
+
 class Config:
 
     def __init__(self):
@@ -39,6 +52,21 @@ class Config:
         self.datapath = './'
         self.minutes_in_day = 1440
         self.translate = False
+        self.stream = False  # read input in chunks and process one day at a time
+        self.chunksize = 100000  # number of input rows read per chunk
+        self.median_sample = 14400  # number of minutes sampled for stream medians
+        self.cachepath = None  # directory of cached minute data, None = no cache
+        self.seed = None  # seed for behavior change permutations, None = random
+        self.bcd_workers = 1  # number of processes for behavior change detection
+        self.bcd_mode = 'random'  # permutation testing mode for change detection
+        self.workers = 1  # number of processes for batch runs over many input files
+        self.incremental = None  # state file for incremental updates, None = off
+        self.timing = False  # write a json report of the time spent in each stage
+        self.profile = None  # name of a stage to run under a profiler, None = off
+        self.profiler = 'cprofile'  # profiler for --profile, cprofile or pyinstrument
+        self.memory = False  # add peak memory and array sizes to the timing report
+        self.memory_budget = None  # megabytes per input file, None = no limit
+        self.spectral_bands = list()  # (low, high) cycles per day, empty = off
 
         # list of activity classes for overall activity
         self.activity_list = ['Errands', 'Exercise', 'Hobby', 'Housework', 'Hygiene', 'Mealtime', 'Other', 'Relax', 'Sleep', 'Socialize', 'Travel', 'Work']
@@ -59,4 +87,75 @@ class Config:
                 self.activity_list = alist.split(',')
             elif option == "--translate":
                 self.translate = True
-        return args[1]
+            elif option == "--stream":
+                self.stream = True
+            elif option == "--chunksize":
+                index += 1
+                self.chunksize = int(args[index])
+            elif option == "--cache":
+                index += 1
+                self.cachepath = args[index]
+            elif option == "--seed":
+                index += 1
+                self.seed = int(args[index])
+            elif option == "--bcd_workers":
+                index += 1
+                self.bcd_workers = int(args[index])
+            elif option == "--bcd_mode":
+                index += 1
+                self.bcd_mode = check_bcd_mode(args[index])
+            elif option == "--workers":
+                index += 1
+                self.workers = int(args[index])
+            elif option == "--incremental":
+                index += 1
+                self.incremental = args[index]
+            elif option == "--timing":
+                self.timing = True
+            elif option == "--profile":
+                index += 1
+                self.profile = args[index]
+            elif option == "--profiler":
+                index += 1
+                self.profiler = args[index]
+            elif option == "--memory":
+                self.memory = True
+            elif option == "--memory_budget":
+                index += 1
+                self.memory_budget = float(args[index])
+            elif option == "--spectral_bands":
+                index += 1
+                self.spectral_bands = parse_bands(args[index])
+            index += 1
+        if num < 2:
+            return None
+        return args[num - 1]
+
+
+def check_bcd_mode(mode):
+    """ Return mode if it is a known behavior change permutation mode,
+    otherwise print the allowed modes and exit with a usage error.
+    """
+    if mode not in bcd_modes:
+        print("Unknown --bcd_mode " + mode + ", use one of: " + ', '.join(bcd_modes))
+        sys.exit(2)
+    return mode
+
+
+def parse_bands(text):
+    """ Return the list of (low, high) frequency bands given as a
+    comma-separated list of low-high pairs, otherwise print the expected
+    format and exit with a usage error.
+    """
+    bands = list()
+    for band in text.split(','):
+        try:
+            low, high = (float(value) for value in band.split('-'))
+        except ValueError:
+            low, high = 0.0, -1.0
+        if not 0.0 <= low < high:
+            print("Invalid --spectral_bands " + text +
+                  ", use low-high pairs in cycles per day, e.g. 0.5-1.5,1.5-2.5")
+            sys.exit(2)
+        bands.append((low, high))
+    return bands
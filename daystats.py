@@ -12,10 +12,8 @@
 # Code and data may not be used or distributed without permission from WSU.
 
 
-import math
 import os.path
 import sys
-from collections import Counter
 
 import numpy as np
 
@@ -46,7 +44,8 @@ class DayStats:
                 x = str(str(line).strip()).split(' ', 2)
                 self.lmappings[x[0]] = x[1]
 
-    def extract_features(self, data, location):
+    def extract_features(self, data, location, locarray=None, hour_values=None,
+                         missing_counts=None):
         """ Extract feature vector.
         Features are: total rotation, total acceleration,
         distance travelled, number of missing sensor readings,
@@ -56,116 +55,145 @@ class DayStats:
         first occurrence primary activity (12),
         time spent at each location type (4),
         first occurrence at each location (4)
+        If locarray is given, it holds the location type index of each minute.
+        If hour_values is given (the HourStats features for the same data),
+        the features that are sums over the day are computed by adding up
+        the 24 hours of each day, and only distance and first occurrences
+        are computed from the minute data.
+        If missing_counts is given (the per-day counts returned by
+        impute.impute_values), the missing values are taken from it instead of
+        being counted.
         """
 
         cf = config.Config()
         activity_names = cf.activity_list  # primary activities
 
-        latitudes = data[:, cf.latitude]
-        longitudes = data[:, cf.longitude]
         numfeatures = int(4 + (2 * cf.num_activities) +
                           (2 * len(activity_names)) + (2 * cf.num_locations))
         numdays = int(len(data) / self.samplerate)
-        locarray = np.zeros(len(latitudes))
-        for i in range(len(latitudes)):
-            locarray[i] = generate_location(latitudes[i], longitudes[i], location)
+        if locarray is None:
+            locarray = location.label_locations(data[:, cf.latitude], data[:, cf.longitude])
         day_values = np.zeros((numdays, numfeatures))
-        for i in range(numdays):
-            day_rotation = 0.0
-            day_acceleration = 0.0
-            day_missing = 0.0
-            day_distance = 0.0
-            xvalue = 0.0
-            yvalue = 0.0
-            begin_day = i * self.samplerate
-            for j in range(self.samplerate):
-                num = begin_day + j
-                element = data[num]
-                rotation = (element[cf.x_rotation] * element[cf.x_rotation]) + \
-                           (element[cf.y_rotation] * element[cf.y_rotation]) + \
-                           (element[cf.z_rotation] * element[cf.z_rotation])
-                day_rotation += rotation
-                acceleration = (element[cf.x_acceleration] * element[cf.x_acceleration]) + \
-                               (element[cf.y_acceleration] * element[cf.y_acceleration]) + \
-                               (element[cf.z_acceleration] * element[cf.z_acceleration])
-                day_acceleration += acceleration
-                day_missing += element[cf.missing_value_pos]
-                if j > 1:
-                    xdist = element[cf.latitude] - xvalue
-                    ydist = element[cf.longitude] - yvalue
-                    day_distance += math.sqrt((xdist * xdist) + (ydist * ydist))
-                xvalue = element[cf.latitude]
-                yvalue = element[cf.longitude]
-            day_values[i][0] = day_rotation
-            day_values[i][1] = day_acceleration
-            day_values[i][2] = day_distance
-            day_values[i][3] = day_missing
-            end_day = begin_day + self.samplerate  # one day for primary activity
-            actsubset = data[begin_day:end_day, cf.activity_pos]
-            astart = 4
+        days = np.reshape(data[:numdays * self.samplerate],
+                          (numdays, self.samplerate, data.shape[1]))
+        locdays = np.reshape(locarray[:numdays * self.samplerate],
+                             (numdays, self.samplerate))
+        actdays = days[:, :, cf.activity_pos]
+        ocdays = days[:, :, cf.oneclass_pos:cf.oneclass_pos + cf.num_activities]
+        astart = 4
+        pstart = astart + cf.num_activities
+        fstart = pstart + len(activity_names)
+        lstart = astart + (2 * cf.num_activities) + (2 * len(activity_names))
+
+        if hour_values is not None:
+            self.add_hour_features(day_values, hour_values, numdays)
+        else:
+            day_values[:, 0] = np.sum(motion_energy(days, cf.x_rotation), axis=1)
+            day_values[:, 1] = np.sum(motion_energy(days, cf.x_acceleration), axis=1)
+            if missing_counts is None:
+                day_values[:, 3] = np.sum(days[:, :, cf.missing_value_pos], axis=1)
+
             # time spent on each activity, index 4..36
-            for j in range(cf.num_activities):
-                counter = Counter(data[begin_day:end_day, cf.oneclass_pos + j])
-                day_values[i][j + astart] = counter[1.0]
+            day_values[:, astart:pstart] = np.sum(ocdays == 1.0, axis=1)
 
             # time spent on primary activity, index 37..48
-            for j in range(len(activity_names)):
-                day_values[i][j + astart + cf.num_activities] = np.sum(actsubset == float(j))
-
-            # time of first occurrence for each activity, index 49..81
-            for j in range(cf.num_activities):
-                asubset = data[begin_day:end_day, cf.oneclass_pos + j]
-                if j not in asubset:
-                    occurrence_time = -1
-                else:
-                    occurrence_time = np.where(asubset == float(j))[0][0]
-                    occurrence_time = occurrence_time // 60
-                day_values[i][j + astart + cf.num_activities + len(activity_names)] = \
-                    occurrence_time
-
-            # time of first occurrence for activity label, index 82..93
-            for j in range(len(activity_names)):
-                if j not in actsubset:
-                    occurrence_time = -1
-                else:
-                    occurrence_time = np.where(actsubset == float(j))[0][0] // 60
-                day_values[i][j + astart + (2 * cf.num_activities) + len(activity_names)] = \
-                    occurrence_time
-
-            locsubset = locarray[begin_day:end_day]
-            lstart = astart + (2 * cf.num_activities) + (2 * len(activity_names))
-
-            # time spent at location, index 94..98
-            for j in range(cf.num_locations):
-                np.set_printoptions(threshold=sys.maxsize)
-                day_values[i][j + lstart] = np.sum(locsubset == float(j))
-
-            # time of first location visit, index 99..102
-            for j in range(cf.num_locations):
-                if j not in locsubset:
-                    occurrence_time = -1
-                else:
-                    occurrence_time = np.where(locsubset == float(j))[0][0] // 60
-                day_values[i][j + lstart + cf.num_locations] = occurrence_time
+            day_values[:, pstart:fstart] = count_values(actdays, len(activity_names))
+
+            # time spent at location, index 94..101
+            day_values[:, lstart:lstart + cf.num_locations] = \
+                count_values(locdays, cf.num_locations)
+
+        if missing_counts is not None:
+            day_values[:, 3] = missing_counts[:numdays]
+
+        xdist = days[:, 2:, cf.latitude] - days[:, 1:-1, cf.latitude]
+        ydist = days[:, 2:, cf.longitude] - days[:, 1:-1, cf.longitude]
+        day_values[:, 2] = np.sum(np.sqrt((xdist * xdist) + (ydist * ydist)), axis=1)
+
+        # time of first occurrence for each activity, index 49..81
+        # (as before, one-class column j is searched for the value j)
+        day_values[:, fstart:fstart + cf.num_activities] = \
+            first_occurrence(ocdays == np.arange(cf.num_activities))
+
+        # time of first occurrence for activity label, index 82..93
+        fstart += cf.num_activities
+        day_values[:, fstart:fstart + len(activity_names)] = \
+            first_occurrence(one_hot(actdays, len(activity_names)))
+
+        # time of first location visit, index 102..109
+        day_values[:, lstart + cf.num_locations:] = \
+            first_occurrence(one_hot(locdays, cf.num_locations))
         return day_values
 
-    def day_stats(self, data, location):
+    def add_hour_features(self, day_values, hour_values, numdays):
+        """ Fill in the day features that are sums of hour features: rotation,
+        acceleration, missing readings, and time spent on each oc activity,
+        primary activity, and location.
+        """
+        cf = config.Config()
+        numactivities = cf.num_activities + len(cf.activity_list)
+        hours_in_day = self.samplerate // 60
+        hours = np.reshape(hour_values[:numdays * hours_in_day],
+                           (numdays, hours_in_day, hour_values.shape[1]))
+        day_sums = np.sum(hours, axis=1)
+        day_values[:, [0, 1, 3]] = day_sums[:, [0, 1, 3]]
+
+        # time spent on each oc and primary activity, index 4..48
+        day_values[:, 4:4 + numactivities] = day_sums[:, 4:4 + numactivities]
+
+        # time spent at location, index 94..101
+        lstart = 4 + (2 * numactivities)
+        day_values[:, lstart:lstart + cf.num_locations] = \
+            day_sums[:, 4 + numactivities:4 + numactivities + cf.num_locations]
+
+    def day_stats(self, data, location, locarray=None, hour_values=None,
+                  missing_counts=None):
         """ Generate markers that describe one day of behavior data.
         """
         if location is None:
             location = loc.Location()
             location.read_location_mappings()
-        locations_index = location.read_locations()
-        return self.extract_features(data, location)
+        if not location.locations:
+            location.read_locations()
+        return self.extract_features(data, location, locarray, hour_values,
+                                     missing_counts)
+
+
+def motion_energy(data, xpos):
+    """ Compute the squared magnitude of a three-axis sensor whose x axis is
+    stored in column xpos, for every minute in the input array.
+    """
+    x = data[..., xpos]
+    y = data[..., xpos + 1]
+    z = data[..., xpos + 2]
+    return (x * x) + (y * y) + (z * z)
+
+
+def one_hot(values, numvalues):
+    """ Compare an array of index values against each index 0..numvalues-1.
+    The result has one more (last) dimension than the input.
+    """
+    return values[..., np.newaxis] == np.arange(numvalues)
+
+
+def count_values(values, numvalues):
+    """ Count how often each index 0..numvalues-1 occurs in each row of a
+    2D array of index values.
+    """
+    n = len(values)
+    valid = (values >= 0) & (values < numvalues) & (values == np.floor(values))
+    rows = np.broadcast_to(np.arange(n)[:, np.newaxis], values.shape)
+    positions = (rows[valid] * numvalues) + values[valid].astype(np.int64)
+    counts = np.bincount(positions, minlength=n * numvalues)
+    return np.reshape(counts, (n, numvalues))
 
 
-def generate_location(latitude, longitude, location):
-    """ Generate the index corresponding to a location type for input
-        latitude and longitude.
+def first_occurrence(mask):
+    """ Compute the hour of the first True value along the minutes (second)
+    axis of a (rows, minutes, values) boolean array, or -1 if there is none.
     """
-    location_type = location.find_location(latitude, longitude)
-    name = location.map_location_name(location_type)
-    return location.generate_location_num(name)
+    first = np.argmax(mask, axis=1) // 60
+    return np.where(np.any(mask, axis=1), first, -1)
 
 
 def main(filename):
@@ -13,6 +13,7 @@
 # Code and data may not be used or distributed without permission from WSU.
 
 
+import copy
 import os.path
 import sys
 
@@ -21,13 +22,26 @@ import pandas as pd
 
 import bcd
 import bstats
+import cache
 import config
 import daystats
 import downsample
 import hourstats
 import impute
+import incremental
 import loc
 import printheader
+import timing
+
+
+# approximate peak memory per input row relative to the size of one matrix row
+batch_memory_factor = 2  # raw matrix plus a sorted copy made by downsampling
+chunk_memory_factor = 8  # parsed chunk plus the csv text and parser buffers
+stream_overhead = 20  # megabytes used by the csv parser independent of chunk size
+min_chunksize = 1000  # smallest number of rows read per chunk under a budget
+imputed_memory_factor = 3  # imputed matrix, the minute matrix it is built from,
+                           # and the temporaries of the (hours, 60, k) stats
+bcd_memory_factor = 8  # copies of one batch of (24, k) permutation sums in bcd
 
 
 class DM:
@@ -69,6 +83,212 @@ class DM:
         return data
 
 
+def read_chunks(infile, chunksize):
+    """ Read a csv file of sensor data, yielding blocks of at most chunksize rows.
+    """
+    for df in pd.read_csv(infile, header=None, chunksize=chunksize, dtype=float):
+        yield df.to_numpy()
+
+
+def load_minute_data(infile, cf, timer=None):
+    """ Read sensor data from a file, then downsample and impute it. Return
+    the imputed matrix with the mask of imputed minutes and the number of
+    imputed minutes on each day. If a cache directory is configured, the
+    imputed matrix is stored there and loaded directly on later runs with the
+    same input; the mask and counts are then None, and the missing values are
+    counted from the missing value column.
+    """
+    if timer is None:
+        timer = timing.StageTimer(enabled=False)
+    key = None
+    if cf.cachepath is not None:
+        with timer.stage('read_cache'):
+            key = cache.cache_key(infile, cf)
+            data = cache.load_matrix(cf.cachepath, key, 'imputed')
+        if data is not None:
+            timer.count('minute_cache_hits', 1)
+            return data, None, None
+    with timer.stage('read'):
+        data = np.loadtxt(infile, delimiter=',')
+    timer.array('read', 'raw', data)
+    with timer.stage('downsample', len(data)):
+        data = downsample.downsample(data)
+    timer.array('downsample', 'minutes', data)
+    with timer.stage('impute', len(data)):
+        data, missing, counts = impute.impute_values(data, return_missing=True)
+    timer.array('impute', 'imputed', data)
+    timer.array('impute', 'missing', missing)
+    if key is not None:
+        cache.save_matrix(cf.cachepath, key, 'imputed', data)
+    return data, missing, counts
+
+
+def estimate_rows(infile, sample_lines=1000):
+    """ Estimate the number of rows and columns of a csv file from the length
+    of its first lines and the size of the file.
+    """
+    lengths = list()
+    columns = 0
+    with open(infile, "rb") as file:
+        for line in file:
+            lengths.append(len(line))
+            columns = max(columns, line.count(b',') + 1)
+            if len(lengths) == sample_lines:
+                break
+    if not lengths:
+        return 0, 0
+    return int(os.path.getsize(infile) / np.mean(lengths)) + 1, columns
+
+
+def estimate_days(infile, cf):
+    """ Estimate the number of days spanned by a csv file from the dates in
+    its first and last lines.
+    """
+    with open(infile, "rb") as file:
+        first = file.readline()
+        file.seek(max(0, os.path.getsize(infile) - 4096))
+        lines = file.read().splitlines()
+    if not first.strip() or not lines:
+        return 0
+    first_date = float(first.split(b',')[cf.date])
+    last_date = float(lines[-1].split(b',')[cf.date])
+    return int(abs(last_date - first_date)) + 1
+
+
+def plan_memory(infile, cf):
+    """ Choose how to process infile within the memory budget cf.memory_budget
+    (in megabytes of data on top of the memory used by Python and the
+    libraries). Reading the whole file holds the raw matrix and, if its rows
+    are out of order, a sorted copy while it is downsampled. Imputation then
+    holds a matrix with one row per minute of every day spanned by the file,
+    next to the minute matrix it is built from, and the hour and day stats
+    add temporaries over its (hours, 60, k) view. Behavior change detection
+    evaluates one batch of permutations at a time, whatever the mode.
+    If the larger of the read and imputation phases plus the permutation
+    batch is estimated to exceed the budget, a copy of cf is returned with
+    streaming turned on and a chunk size that fits in the budget. Also
+    return the estimated size in megabytes of processing the whole file at
+    once.
+    """
+    if cf.memory_budget is None or cf.stream or cf.incremental is not None:
+        return cf, None
+    rows, columns = estimate_rows(infile)
+    row_mb = columns * 8 / 2 ** 20
+    imputed_row_mb = (cf.missing_value_pos + 1) * 8 / 2 ** 20
+    num_hour_features = 4 + cf.num_activities + len(cf.activity_list) + cf.num_locations
+    bcd_mb = bcd.BCD().batch_size * 24 * num_hour_features * 8 / 2 ** 20 * bcd_memory_factor
+    read_mb = rows * row_mb * batch_memory_factor
+    imputed_mb = estimate_days(infile, cf) * cf.minutes_in_day * imputed_row_mb * \
+        imputed_memory_factor
+    estimate = max(read_mb, imputed_mb) + bcd_mb
+    if estimate <= cf.memory_budget:
+        return cf, estimate
+    stream_cf = copy.copy(cf)
+    stream_cf.stream = True
+    day_mb = cf.minutes_in_day * imputed_row_mb * imputed_memory_factor
+    available = cf.memory_budget - stream_overhead - cf.median_sample * row_mb - \
+        day_mb - bcd_mb
+    stream_cf.chunksize = max(min_chunksize,
+                              int(available / (row_mb * chunk_memory_factor)))
+    return stream_cf, estimate
+
+
+def stream_values(infile, cf, day, hour, location):
+    """ Generate day and hour values one day at a time. The input is read in
+    chunks and passed through downsampling and imputation, so memory use
+    depends on the chunk size rather than on the length of the recording.
+    The input is read twice: once to estimate the imputation medians and once
+    to generate the values.
+    """
+    minutes = downsample.downsample_stream(read_chunks(infile, cf.chunksize))
+    sample = impute.sample_minutes(minutes, cf.median_sample)
+    if sample is None:
+        return
+    medians = impute.generate_medians(cf, sample)
+    minutes = downsample.downsample_stream(read_chunks(infile, cf.chunksize))
+    for data in impute.impute_stream(minutes, medians):
+        locarray = location.label_locations(data[:, cf.latitude], data[:, cf.longitude])
+        hour_values = hour.extract_features(data, location, locarray)
+        yield day.extract_features(data, location, locarray, hour_values), hour_values
+
+
+def process_file(dm, filename, location):
+    """ Generate the behavior markers for one input file and save them.
+    The location object is only read from file if it holds no locations yet,
+    so it can be shared by several input files. A relative filename is
+    relative to the data path; an absolute one is used as is.
+    If timing is enabled, a json report of the time spent in each stage is
+    written next to the marker files.
+    """
+    infile = os.path.join(dm.cf.datapath, filename)
+    prefix = printheader.output_prefix(filename)
+    timer = timing.StageTimer(dm.cf.timing or dm.cf.memory or dm.cf.profile is not None,
+                              dm.cf.profile, dm.cf.profiler, prefix, dm.cf.memory)
+    cf, estimate = plan_memory(infile, dm.cf)
+    if cf.memory_budget is not None:
+        timer.info['memory_budget_mb'] = cf.memory_budget
+        timer.info['estimated_batch_mb'] = estimate
+        timer.info['chunksize'] = cf.chunksize if cf.stream else None
+    lookups = location.lookups
+    cache_hits = location.cache_hits
+    gps_queries = location.gps_queries
+    day = daystats.DayStats()  # Generate daily behavior features
+    hour = hourstats.HourStats()  # Generate hourly behavior features
+    if not location.locations:
+        with timer.stage('read_locations'):
+            location.read_locations()
+    if dm.cf.incremental is not None:
+        with timer.stage('incremental'):
+            day_values, hour_values = incremental.update_file(infile, dm.cf, day, hour,
+                                                              location)
+        if day_values is None:
+            print('No data in', dm.cf.incremental, 'yet; no markers written.')
+            return
+    elif cf.stream:
+        day_rows = list()
+        hour_rows = list()
+        with timer.stage('stream'):
+            for day_row, hour_row in stream_values(infile, cf, day, hour, location):
+                day_rows.append(day_row)
+                hour_rows.append(hour_row)
+        day_values = np.vstack(day_rows)
+        hour_values = np.vstack(hour_rows)
+    else:
+        data, missing, counts = load_minute_data(infile, dm.cf, timer)
+        # label the location type of each minute once
+        with timer.stage('label_locations', len(data)):
+            locarray = location.label_locations(data[:, dm.cf.latitude],
+                                                data[:, dm.cf.longitude])
+        timer.array('label_locations', 'locations', locarray)
+        with timer.stage('hour_stats', len(data)):
+            hour_values = hour.hour_stats(data, location, locarray, missing)
+        with timer.stage('day_stats', len(data)):
+            day_values = day.day_stats(data, location, locarray, hour_values, counts)
+        del data, locarray, missing
+    timer.array('hour_stats', 'hour_values', hour_values)
+    timer.array('day_stats', 'day_values', day_values)
+    bm = bstats.BehaviorStats()  # Generate global behavior features
+    bm.spectral_bands = dm.cf.spectral_bands
+    with timer.stage('behavior_stats', len(hour_values)):
+        behavior_markers = bm.behavior_stats(day_values, hour_values)
+    # Generate weekly change from baseline
+    behavior_change = bcd.BCD(dm.cf.seed, dm.cf.bcd_workers)
+    behavior_change.permutation_mode = dm.cf.bcd_mode
+    with timer.stage('bcd', len(day_values)):
+        change_scores = behavior_change.bcd(day_values, hour_values)
+    if dm.cf.bcd_mode != 'random':  # report the permutations used for each week
+        change_scores = [(cs, is_sig, num_used) for (cs, is_sig), num_used in
+                         zip(change_scores, behavior_change.permutations_used)]
+    with timer.stage('write'):
+        printheader.print_markers(filename, day_values, hour_values,
+                                  behavior_markers, change_scores, dm, day, hour, bm,
+                                  True)
+    timer.count('find_location_calls', location.lookups - lookups)
+    timer.count('location_cache_hits', location.cache_hits - cache_hits)
+    timer.count('gps_queries', location.gps_queries - gps_queries)
+    timer.write(prefix + '.timing.json')
+
+
 def main():
     dm = DM()
     filename = dm.cf.set_parameters(sys.argv)
@@ -77,20 +297,7 @@ def main():
         exit()
     location = loc.Location()
     location.read_location_mappings()
-    infile = os.path.join(dm.cf.datapath, filename)
-    data = np.loadtxt(infile, delimiter=',')
-    data = downsample.downsample(data)
-    data = impute.impute_values(data)
-    day = daystats.DayStats()  # Generate daily behavior features
-    day_values = day.day_stats(data, location)
-    hour = hourstats.HourStats()  # Generate hourly behavior features
-    hour_values = hour.hour_stats(data, location)
-    bm = bstats.BehaviorStats()  # Generate global behavior features
-    behavior_markers = bm.behavior_stats(day_values, hour_values)
-    behavior_change = bcd.BCD()  # Generate weekly change from baseline
-    change_scores = behavior_change.bcd(day_values, hour_values)
-    printheader.print_markers(filename, day_values, hour_values,
-                              behavior_markers, change_scores, dm, day, hour, bm, True)
+    process_file(dm, filename, location)
 
 
 if __name__ == "__main__":
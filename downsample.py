@@ -20,48 +20,74 @@ import config
 
 # global variables
 original_sample_rate = 600  # number of samples per minute
-new_sample_rate = 1
-downrate = int(original_sample_rate / new_sample_rate)
 
 
-def seconds_to_minutes(seconds):
-    """ Map time of day in seconds past midnight to time of day in
-    minutes past midnight.
+def minute_keys(cf, data):
+    """ Map each row to its absolute minute, i.e. the number of minutes since
+    midnight on day 0, using the date and time (seconds past midnight) columns.
     """
-    return int(seconds / 60)
+    dates = data[:, cf.date].astype(np.int64)
+    minutes = np.floor_divide(data[:, cf.time], 60).astype(np.int64)
+    return (dates * cf.minutes_in_day) + minutes
 
 
 def downsample(data):
     """ Downsample sensor data. This function assumes that the original
     sample rate is higher than the new sample rate. To downsample, values
-    are aggregated over a window of sensor values.
+    are aggregated over each minute of sensor values. Rows are grouped by the
+    minute reported in their time column rather than by a fixed number of
+    rows, so dropped samples do not shift the following windows.
     Numeric sensor values are replaced by the mean over the window.
-    For date, location, and activity, the most recent value is used.
+    For date and activity, the value reported at the start of the window is
+    used.
     """
     cf = config.Config()
-    n = len(data)
-    k = len(data[0])
-    window_size = int(n / downrate)
-    newdata = np.empty((window_size, k))
-
-    for i in range(window_size):  # aggregate values over window
-        newdata[i][cf.date] = data[i * downrate][cf.date]  # last value
-        newdata[i][cf.time] = seconds_to_minutes(data[i * downrate][cf.time])
-        newdata[i][cf.latitude] = data[i * downrate][cf.latitude]
-        newdata[i][cf.longitude] = data[i * downrate][cf.longitude]
-        newdata[i][cf.altitude] = data[i * downrate][cf.altitude]
-        for j in (cf.yaw, cf.pitch, cf.roll,  # mean
-                  cf.x_rotation, cf.y_rotation, cf.z_rotation,
-                  cf.x_acceleration, cf.y_acceleration,
-                  cf.z_acceleration, cf.latitude, cf.longitude,
-                  cf.altitude, cf.course, cf.speed,
-                  cf.horizontal_accuracy, cf.vertical_accuracy):
-            newdata[i][j] = np.mean(data[i * downrate:(i * downrate) + downrate, j])
-        for j in range(18, k):  # use last one-class and primary activity labels
-            newdata[i][j] = data[i * downrate][j]
+    data = np.asarray(data, dtype=float)
+    if data.ndim == 1:
+        data = data.reshape(1, -1)
+    if len(data) == 0:
+        return np.empty((0, data.shape[1]))
+
+    keys = minute_keys(cf, data)
+    if np.any(keys[1:] < keys[:-1]):  # rows out of order, group by minute
+        order = np.argsort(keys, kind='stable')
+        data = data[order]
+        keys = keys[order]
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    counts = np.diff(np.r_[starts, len(data)])
+
+    # use first one-class and primary activity labels in each window
+    newdata = data[starts]
+    newdata[:, cf.time] = keys[starts] % cf.minutes_in_day
+    sensors = slice(cf.yaw, cf.num_sensors)  # mean of numeric sensor values
+    newdata[:, sensors] = np.add.reduceat(data[:, sensors], starts, axis=0) / \
+        counts[:, np.newaxis]
     return newdata
 
 
+def downsample_stream(chunks):
+    """ Downsample a sequence of raw data chunks, yielding one block of minute
+    values per chunk. Rows that belong to the last minute of a chunk are held
+    back until the next chunk arrives, because that minute may continue in
+    the next chunk.
+    """
+    cf = config.Config()
+    pending = None
+    for chunk in chunks:
+        chunk = np.asarray(chunk, dtype=float)
+        if pending is not None:
+            chunk = np.vstack((pending, chunk))
+        if len(chunk) == 0:
+            continue
+        keys = minute_keys(cf, chunk)
+        last = (keys == keys[-1])
+        pending = chunk[last]
+        if not np.all(last):
+            yield downsample(chunk[~last])
+    if pending is not None and len(pending) > 0:
+        yield downsample(pending)
+
+
 def main(filename):
     cf = config.Config()
     # Already complete.
@@ -85,24 +85,9 @@ def fft_features(data):
     """ Calculate the periodic components that express the input array of data
     using a Discrete Fourier Transform.
     """
-    fft_feature = np.fft.fft(data)
-    ceps = fft_feature[0].real
-    lceps = len(fft_feature)
-    psd = []
-    psdtotal = 0.0
-    energy = 0.0
-    for i in range(lceps):
-        r = fft_feature[i].real
-        energy += r
-        value = (r * r) / float(lceps) + 1e-08
-        psd.append(value)
-        psdtotal += value
-    entropy = 0.0
-    for i in range(lceps):
-        entropy -= psd[i] * math.log(psd[i])
-    msignal = np.mean(fft_feature).real
-    vsignal = np.var(fft_feature).real
-    return ceps, entropy, energy, msignal, vsignal
+    ceps, entropy, energy, msignal, vsignal = \
+        fft_features_batch(np.asarray(data, dtype=float)[np.newaxis, :])
+    return ceps[0], entropy[0], energy[0], msignal[0], vsignal[0]
 
 
 def interquartile_range(data):
@@ -268,6 +253,182 @@ def trajectory(latitude, longitude):
     return math.atan(slopepercent)
 
 
+def crossings_batch(data, reference):
+    """ Count, for each row of a 2D array, the number of times the values
+    cross the row's reference value as the row is traversed from beginning
+    to end. A value equal to the reference interrupts a crossing, as in
+    zero_crossings and mean_crossings.
+    """
+    signs = np.sign(data - reference[:, np.newaxis])
+    return np.sum((signs[:, 1:] * signs[:, :-1]) < 0, axis=1)
+
+
+def spectrum_weights(lceps):
+    """ Return how many bins of the full DFT of a real sequence of length
+    lceps each bin of its real FFT stands for. Bin 0 (and bin lceps/2 when
+    lceps is even) occurs once, every other bin has a mirror image.
+    """
+    weights = np.full(lceps // 2 + 1, 2.0)
+    weights[0] = 1.0
+    if lceps % 2 == 0:
+        weights[-1] = 1.0
+    return weights
+
+
+def fft_features_batch(data):
+    """ Calculate ceps, entropy, energy, msignal, and vsignal (as in
+    fft_features) along the last axis of an array of data.
+    The DFT of real data is conjugate symmetric, so only the real FFT is
+    computed and the remaining values follow from closed forms: the DFT sums
+    to lceps * x[0], has mean x[0] and, by Parseval, variance
+    sum(x^2) - x[0]^2.
+    """
+    data = np.asarray(data, dtype=float)
+    lceps = data.shape[-1]
+    r = np.fft.rfft(data, axis=-1).real
+    ceps = r[..., 0]
+    psd = (r * r) / float(lceps) + 1e-08
+    entropy = -np.sum(spectrum_weights(lceps) * psd * np.log(psd), axis=-1)
+    energy = lceps * data[..., 0]
+    msignal = data[..., 0].copy()
+    vsignal = np.sum(data * data, axis=-1) - msignal * msignal
+    return ceps, entropy, energy, msignal, vsignal
+
+
+def spectral_features_batch(data, sample_rate=1.0, bands=()):
+    """ Calculate additional spectral features along the last axis of an
+    array of data: the dominant frequency (the non-zero frequency with the
+    most power) and the power within each (low, high) frequency band,
+    low inclusive and high exclusive. Frequencies are in cycles per unit of
+    1/sample_rate.
+    """
+    data = np.asarray(data, dtype=float)
+    lceps = data.shape[-1]
+    spectrum = np.fft.rfft(data, axis=-1)
+    power = spectrum_weights(lceps) * np.abs(spectrum) ** 2 / float(lceps)
+    frequencies = np.fft.rfftfreq(lceps, d=1.0 / sample_rate)
+    if lceps > 1:
+        dominant = frequencies[1 + np.argmax(power[..., 1:], axis=-1)]
+    else:
+        dominant = np.zeros(data.shape[:-1])
+    band_energies = np.zeros(data.shape[:-1] + (len(bands),))
+    for i, (low, high) in enumerate(bands):
+        in_band = (frequencies >= low) & (frequencies < high)
+        band_energies[..., i] = np.sum(power[..., in_band], axis=-1)
+    return dominant, band_energies
+
+
+def interquartile_range_batch(data):
+    """ Calculate the interquartile range of each row of a 2D array of data,
+    using the same sorted positions as interquartile_range.
+    """
+    num = data.shape[1]
+    newlist = np.sort(data, axis=1)
+    return newlist[:, (3 * num) // 4] - newlist[:, num // 4]
+
+
+def skewness_batch(data, mean):
+    """ Calculate the skewness of each row of a 2D array of data.
+    """
+    deviation = data - mean[:, np.newaxis]
+    n1 = np.mean(deviation ** 3, axis=1)
+    n2 = np.mean(deviation ** 2, axis=1) ** 1.5
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(n2 == 0, 0.0, n1 / n2)
+
+
+def kurtosis_batch(data, mean, std):
+    """ Calculate the kurtosis of each row of a 2D array of data.
+    """
+    deviation = data - mean[:, np.newaxis]
+    n1 = np.mean(deviation ** 4, axis=1)
+    n2 = std ** 4
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(n2 == 0, -3.0, (n1 / n2) - 3.0)
+
+
+def log_signal_energy_batch(data):
+    """ Calculate the log signal energy of each row of a 2D array of data,
+    skipping zero values.
+    """
+    d2 = data * data
+    return np.sum(np.log10(np.where(d2 != 0, d2, 1.0)), axis=1)
+
+
+def autocorrelation_batch(data, mean):
+    """ Calculate the lag-one autocorrelation of each row of a 2D array of
+    data, as in autocorrelation. Rows with a single value have 0.
+    """
+    num = data.shape[1]
+    if num < 2:
+        return np.zeros(len(data))
+    deviation = data - mean[:, np.newaxis]
+    sum1 = np.sum(deviation[:, :-1] * deviation[:, 1:], axis=1) / (num - 1)
+    sum2 = np.sum(deviation[:, 1:] ** 2, axis=1) / num
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(sum2 == 0, 0.0, sum1 / sum2)
+
+
+def generate_statistical_features_batch(x):
+    """ Create the statistical features of generate_statistical_features for
+    many sequences at once. The input is a (windows x samples) array and the
+    output is a (windows x 30) array, with the features in the same order.
+    """
+    x = np.asarray(x, dtype=float)
+    if x.ndim == 1:
+        x = x[np.newaxis, :]
+    num = x.shape[1]
+    total = np.sum(x, axis=1)  # sum
+    mean = total / num  # mean
+    median = np.median(x, axis=1)  # median
+    mav = np.median(np.absolute(x), axis=1)  # mean / median absolute value
+    variance = np.var(x, axis=1)
+    std = np.std(x, axis=1)
+    deviation = np.absolute(x - np.mean(x, axis=1, keepdims=True))
+    m1 = np.mean(deviation, axis=1)  # mad1
+    m2 = np.median(deviation, axis=1)  # mad2
+    zc = crossings_batch(x, median)  # zero crossings
+    mc = crossings_batch(x, mean)  # mean crossings
+    centered = x - np.mean(x, axis=1, keepdims=True)
+    moment2 = np.mean(centered ** 2, axis=1)
+    moment3 = np.mean(centered ** 3, axis=1)
+    moment4 = np.mean(centered ** 4, axis=1)
+    ceps, entropy, energy, msignal, vsignal = fft_features_batch(x)
+    iqr = interquartile_range_batch(x)  # interquartile range
+    with np.errstate(divide='ignore', invalid='ignore'):
+        coefficient_of_variation = np.where(mean == 0, 0.0, std / mean)  # cv
+    skew = skewness_batch(x, mean)  # skewness
+    k = kurtosis_batch(x, mean, std)  # kurtosis
+    se = np.sum(x ** 2, axis=1)  # SMA
+    lse = log_signal_energy_batch(x)  # log SMA
+    p = se / num  # power
+    ac = autocorrelation_batch(x, mean)  # autocorrelation
+    return np.column_stack((np.max(x, axis=1), np.min(x, axis=1), total, mean,
+                            median, mav, mav, variance, std, m1, m2, zc, mc,
+                            np.zeros(len(x)), moment2, moment3, moment4,
+                            ceps, entropy, energy, msignal, vsignal, iqr,
+                            coefficient_of_variation, skew, k, se, lse, p, ac))
+
+
+def generate_statistical_features_list(sequences):
+    """ Create the statistical features of several sequences, concatenated in
+    input order. Sequences of the same length are processed in one batch.
+    """
+    feature_lists = [[] for i in range(len(sequences))]
+    lengths = [len(sequence) for sequence in sequences]
+    for num in set(lengths):
+        if num == 0:
+            continue
+        positions = [i for i in range(len(sequences)) if lengths[i] == num]
+        batch = generate_statistical_features_batch([sequences[i] for i in positions])
+        for i, row in zip(positions, batch):
+            feature_lists[i] = row.tolist()
+    feature_list = []
+    for features in feature_lists:
+        feature_list.extend(features)
+    return feature_list
+
+
 def generate_statistical_features(x):
     """ Create a list of statistical features for a sequence of values
     corresponding to one type of sensor (e.g., acceleration, rotation, location).
@@ -12,14 +12,16 @@
 # Code and data may not be used or distributed without permission from WSU.
 
 
-import math
 import sys
 from operator import itemgetter
 
 from geopy.geocoders import Nominatim
 
+import locindex
+
 # global variables
 gps_locations = list()
+gps_index = None  # spatial index of gps_locations
 
 geolocator = Nominatim(user_agent='DM')
 
@@ -214,6 +216,7 @@ def is_service(lt, classname):
 
 def print_features(latitude, longitude, gpstype, classname):
     global gps_locations
+    global gps_index
 
     feature_tuple = list()
     feature_tuple.append(float(latitude))
@@ -238,11 +241,14 @@ def print_features(latitude, longitude, gpstype, classname):
     feature_tuple.append(classname)
     print(feature_tuple)
     gps_locations.append(feature_tuple)
+    gps_index = None
 
 
 def gps_read_locations(lfile):
     global gps_locations
+    global gps_index
 
+    stored = len(gps_locations)
     with open(lfile, "r") as file:
         for line in file:
             x = str(str(line).strip()).split(' ', 4)
@@ -253,18 +259,25 @@ def gps_read_locations(lfile):
             gps_tuple.append(x[3])
             gps_tuple.append(x[4])
             gps_locations.append(gps_tuple)
+    if stored == 0:
+        gps_index = locindex.load_index(lfile)
+    else:
+        gps_index = None
+
+
+def gps_location_index():
+    """ Return a spatial index of gps_locations, rebuilding it if locations
+    have been added since it was built.
+    """
+    global gps_index
+
+    if gps_index is None or len(gps_index) != len(gps_locations):
+        gps_index = locindex.LocationIndex(gps_locations)
+    return gps_index
 
 
 def gps_find_location(lat, long):
-    for gps_tuple in gps_locations:
-        lat1 = float(lat)
-        long1 = float(long)
-        tlat = gps_tuple[0]
-        tlong = gps_tuple[1]
-        dist = math.sqrt(((tlat - lat1) * (tlat - lat1)) + ((tlong - long1) * (tlong - long1)))
-        if dist < .005:
-            return gps_tuple[2]
-    return None
+    return gps_location_index().find_location(lat, long)
 
 
 def update_locations(locations, locationsfile):
@@ -14,7 +14,6 @@
 
 import os.path
 import sys
-from collections import Counter
 
 import numpy as np
 
@@ -46,7 +45,7 @@ class HourStats:
                 x = str(str(line).strip()).split(' ', 2)
                 self.lmappings[x[0]] = x[1]
 
-    def extract_features(self, data, location):
+    def extract_features(self, data, location, locarray=None, missing=None):
         """ Extract feature vector.
         Features are:
         total rotation, total acceleration, distance travelled,
@@ -54,79 +53,62 @@ class HourStats:
         time spent on each oc activity (33),
         time spent on primary activity (12),
         time spent at each location type (4)
+        If locarray is given, it holds the location type index of each minute.
+        If missing is given (the mask returned by impute.impute_values), the
+        missing values are counted from it instead of the missing value column.
         """
 
-        latitudes = data[:, self.cf.latitude]
-        longitudes = data[:, self.cf.longitude]
-        locarray = np.zeros(len(latitudes))
-        for i in range(len(latitudes)):
-            locarray[i] = daystats.generate_location(latitudes[i], longitudes[i], location)
+        if locarray is None:
+            locarray = location.label_locations(data[:, self.cf.latitude],
+                                                data[:, self.cf.longitude])
         numfeatures = int(4 + self.cf.num_activities + len(self.cf.activity_list) +
                           self.cf.num_locations)
         numhours = int(len(data) / self.samplerate)
         hour_values = np.zeros((numhours, numfeatures))
-        for i in range(numhours):
-            hour_rotation = 0.0
-            hour_acceleration = 0.0
-            hour_missing = 0.0
-            hour_distance = 0.0
-            begin_hour = i * 60
-            xvalue = 0.0
-            yvalue = 0.0
-            for j in range(self.samplerate):
-                num = begin_hour + j
-                element = data[num]
-                rotation = (element[self.cf.x_rotation] * element[self.cf.x_rotation]) + \
-                           (element[self.cf.y_rotation] * element[self.cf.y_rotation]) + \
-                           (element[self.cf.z_rotation] * element[self.cf.z_rotation])
-                hour_rotation += rotation
-                acceleration = (element[self.cf.x_acceleration] *
-                                element[self.cf.x_acceleration]) + \
-                               (element[self.cf.y_acceleration] *
-                                element[self.cf.y_acceleration]) + \
-                               (element[self.cf.z_acceleration] *
-                                element[self.cf.z_acceleration])
-                hour_acceleration += acceleration
-                hour_missing += element[self.cf.missing_value_pos]
-                if j > 1:
-                    xdist = element[self.cf.latitude] - xvalue
-                    ydist = element[self.cf.longitude] - yvalue
-                    hour_distance += (xdist * xdist) + (ydist * ydist)
-                xvalue = element[self.cf.latitude]
-                yvalue = element[self.cf.longitude]
-            hour_values[i][0] = hour_rotation
-            hour_values[i][1] = hour_acceleration
-            hour_values[i][2] = hour_distance
-            hour_values[i][3] = hour_missing
-
-            end_hour = begin_hour + self.samplerate
-            actsubset = data[begin_hour:end_hour, self.cf.activity_pos]
-            astart = 4
-
-            # time spent on each activity, index 4..36
-            for j in range(self.cf.num_activities):
-                counter = Counter(data[begin_hour:end_hour, self.cf.oneclass_pos + j])
-                hour_values[i][j + astart] = counter[1.0]
-
-            # time spent on primary activity, index 37..48
-            for j in range(len(self.cf.activity_list)):
-                hour_values[i][j + astart + self.cf.num_activities] = np.sum(actsubset == float(j))
-
-            # time spent at location, index 49..52
-            locsubset = locarray[begin_hour:end_hour]
-            lstart = astart + self.cf.num_activities + len(self.cf.activity_list)
-            for j in range(self.cf.num_locations):  # time spent at each location
-                hour_values[i][j + lstart] = np.sum(locsubset == float(j))
+        hours = np.reshape(data[:numhours * self.samplerate],
+                           (numhours, self.samplerate, data.shape[1]))
+        lochours = np.reshape(locarray[:numhours * self.samplerate],
+                              (numhours, self.samplerate))
+
+        hour_values[:, 0] = np.sum(daystats.motion_energy(hours, self.cf.x_rotation), axis=1)
+        hour_values[:, 1] = np.sum(daystats.motion_energy(hours, self.cf.x_acceleration),
+                                   axis=1)
+        xdist = hours[:, 2:, self.cf.latitude] - hours[:, 1:-1, self.cf.latitude]
+        ydist = hours[:, 2:, self.cf.longitude] - hours[:, 1:-1, self.cf.longitude]
+        hour_values[:, 2] = np.sum((xdist * xdist) + (ydist * ydist), axis=1)
+        if missing is None:
+            hour_values[:, 3] = np.sum(hours[:, :, self.cf.missing_value_pos], axis=1)
+        else:
+            hour_values[:, 3] = np.sum(np.reshape(missing[:numhours * self.samplerate],
+                                                  (numhours, self.samplerate)), axis=1)
+        astart = 4
+
+        # time spent on each activity, index 4..36
+        ocstop = self.cf.oneclass_pos + self.cf.num_activities
+        hour_values[:, astart:astart + self.cf.num_activities] = \
+            np.sum(hours[:, :, self.cf.oneclass_pos:ocstop] == 1.0, axis=1)
+
+        # time spent on primary activity, index 37..48
+        pstart = astart + self.cf.num_activities
+        hour_values[:, pstart:pstart + len(self.cf.activity_list)] = \
+            daystats.count_values(hours[:, :, self.cf.activity_pos],
+                                  len(self.cf.activity_list))
+
+        # time spent at location, index 49..56
+        lstart = astart + self.cf.num_activities + len(self.cf.activity_list)
+        hour_values[:, lstart:lstart + self.cf.num_locations] = \
+            daystats.count_values(lochours, self.cf.num_locations)
         return hour_values
 
-    def hour_stats(self, data, location):
+    def hour_stats(self, data, location, locarray=None, missing=None):
         """ Generate markers that describe one hour of behavior data.
         """
         if location is None:
             location = loc.Location()
             location.read_location_mappings()
-        locations_index = location.read_locations()
-        return self.extract_features(data, location)
+        if not location.locations:
+            location.read_locations()
+        return self.extract_features(data, location, locarray, missing)
 
 
 def main(filename):
@@ -59,63 +59,115 @@ def generate_medians(cf, data):
     return medians
 
 
-def replace(cf, i, rp_time, medians):
-    """ Calculate value to impute.
+def sample_minutes(minutes, size, seed=0):
+    """ Draw a uniform reservoir sample of at most size rows from a sequence
+    of minute data blocks, so that medians can be estimated for recordings
+    that do not fit in memory. If the recording has no more than size rows,
+    all of them are kept.
     """
-    if i == cf.date:
-        return int(rp_time / cf.minutes_in_day)
-    elif i == cf.time:
-        return rp_time % cf.minutes_in_day
-    else:
-        return medians[i - 2]
+    rng = np.random.default_rng(seed)
+    sample = None
+    seen = 0
+    for block in minutes:
+        if sample is None:
+            sample = np.empty((size, block.shape[1]))
+        n = len(block)
+        fill = max(0, min(n, size - seen))
+        sample[seen:seen + fill] = block[:fill]
+        if fill < n:  # replace sampled rows with decreasing probability
+            positions = np.arange(seen + fill, seen + n) + 1
+            slots = rng.integers(0, positions)
+            keep = slots < size
+            sample[slots[keep]] = block[fill:][keep]
+        seen += n
+    if sample is None:
+        return None
+    return sample[:min(seen, size)]
+
+
+def missing_days(cf, begin_date, numdays, medians):
+    """ Generate numdays days of imputed values starting at begin_date. Each
+    minute holds the median values and is flagged as a missing value.
+    """
+    numsensors = cf.num_sensors + cf.num_activities + 2
+    minutes = np.arange(numdays * cf.minutes_in_day)
+    days = np.empty((len(minutes), numsensors))
+    days[:, cf.date] = begin_date + (minutes // cf.minutes_in_day)
+    days[:, cf.time] = minutes % cf.minutes_in_day
+    days[:, cf.date + 2:cf.missing_value_pos] = medians
+    days[:, cf.missing_value_pos] = 1
+    return days
+
+
+def impute_stream(minutes, medians):
+    """ Impute missing values for a sequence of minute data blocks, yielding
+    one complete day (one row per minute) at a time. A day is complete once
+    data from a later day is seen or the sequence ends. Days without any data
+    between the first and last reported days are generated from the medians.
+    """
+    cf = config.Config()
+    current = None
+    current_date = None
+    for block in minutes:
+        if len(block) == 0:
+            continue
+        dates = block[:, cf.date].astype(np.int64)
+        for date in np.unique(dates):
+            if current_date is not None and date < current_date:
+                continue  # day already emitted
+            if current_date is not None and date > current_date:
+                yield current
+                for missing_date in range(current_date + 1, date):
+                    yield missing_days(cf, missing_date, 1, medians)
+                current = None
+            if current is None:
+                current = missing_days(cf, date, 1, medians)
+                current_date = date
+            rows = block[dates == date]
+            times = rows[:, cf.time].astype(np.int64)
+            current[times, :cf.missing_value_pos] = rows[:, :cf.missing_value_pos]
+            current[times, cf.missing_value_pos] = 0
+    if current is not None:
+        yield current
+
+
+def minute_positions(cf, data, begin_date):
+    """ Compute the absolute minute index of each row of minute data,
+    counted from midnight on begin_date.
+    """
+    dates = data[:, cf.date].astype(np.int64) - begin_date
+    return (dates * cf.minutes_in_day) + data[:, cf.time].astype(np.int64)
 
 
-def impute_values(data):
+def impute_values(data, medians=None, return_missing=False):
     """ Generate sensor entries for time values between the begin and end
     of the input data that have no entries.
-    This function considers three cases:
-    1. No entries between midnight and the first reported time on the first day
-       of data collection, the function generates those.
-    2. No entries between the last reported time on the last day of
-       data collection and the end of that day, the function generates those.
-    3. A missing chunk of data between the first and last reported times.
+    The output covers every minute from midnight on the first day of data
+    collection through the end of the last day. Observed rows are copied to
+    their minute in a single scatter, and all other minutes are filled with
+    the median values and flagged in the missing value column.
+    If return_missing is True, the function also returns the boolean mask of
+    imputed minutes, built from the scatter positions, and the number of
+    imputed minutes on each day, so callers need not scan the missing value
+    column.
     """
     cf = config.Config()
-    # new size is |sensors| + |activities| + activity label + missingvalue
-    numsensors = cf.num_sensors + cf.num_activities + 2
-    medians = generate_medians(cf, data)
-    begin_date = int(data[0][0])
-    end_date = int(data[len(data) - 1][0])
-    new_size = int((end_date - begin_date) + 1) * cf.minutes_in_day  # total minutes
-    new_data = np.zeros((new_size, numsensors))
-    n = len(data)
-    prevtime = (begin_date * cf.minutes_in_day)  # start at midnight on first day
-    date = data[0][cf.date]
-    impute_time = data[0][cf.time]
-    current_time = int(date * cf.minutes_in_day) + impute_time  # time in minutes
-    count = missing = element = 0
-    while element < n:
-        if prevtime < current_time:  # impute missing values at beginning
-            for i in range(numsensors - 1):
-                new_data[count][i] = replace(cf, i, prevtime, medians)
-            new_data[count][cf.missing_value_pos] = 1
-            missing += 1
-        else:  # copy actual value
-            for i in range(numsensors - 1):
-                new_data[count][i] = data[element][i]
-            element += 1
-            if element < n:
-                date = data[element][cf.date]
-                impute_time = data[element][cf.time]
-                current_time = int(date * cf.minutes_in_day) + int(impute_time / 60)
-        count += 1
-        prevtime += 1
-    while count < new_size:  # fill in missing values on last data day
-        for i in range(numsensors - 1):
-            new_data[count][i] = replace(cf, i, prevtime, medians)
-        new_data[count][cf.missing_value_pos] = 1
-        count += 1
-        missing += 1
+    if medians is None:
+        medians = generate_medians(cf, data)
+    begin_date = int(data[0][cf.date])
+    end_date = int(data[len(data) - 1][cf.date])
+    numdays = (end_date - begin_date) + 1
+    new_data = missing_days(cf, begin_date, numdays, medians)
+    positions = minute_positions(cf, data, begin_date)
+    valid = (positions >= 0) & (positions < len(new_data))
+    positions = positions[valid]
+    new_data[positions, :cf.missing_value_pos] = data[valid, :cf.missing_value_pos]
+    new_data[positions, cf.missing_value_pos] = 0
+    if return_missing:
+        missing = np.ones(len(new_data), dtype=bool)
+        missing[positions] = False
+        counts = np.sum(missing.reshape(numdays, cf.minutes_in_day), axis=1)
+        return new_data, missing, counts
     return new_data
 
 
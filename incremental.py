@@ -0,0 +1,241 @@
+#!/usr/bin/python
+
+# python incremental.py <merged_state_file> <state_file>+
+#
+# Incremental processing of a participant's data. The day and hour tables,
+# their marker accumulators, the imputation medians and the first and last
+# minutes seen are kept in a state file, so a new chunk of raw data is only
+# downsampled, imputed and summarized for the days it adds.
+#
+# Run as a script, the state files of consecutive shards of one recording
+# (for example, one per month) are merged into one state file, and behavior
+# markers computed from the merged accumulators are written next to it.
+
+# Copyright (c) 2020. Washington State University (WSU). All rights reserved.
+# Code and data may not be used or distributed without permission from WSU.
+
+
+import copy
+import os
+import sys
+
+import joblib
+import numpy as np
+
+import accumulate
+import bstats
+import config
+import daystats
+import downsample
+import hourstats
+import impute
+import loc
+import printheader
+
+state_version = 2
+
+
+def new_state():
+    """ Return the state of a participant with no data yet.
+    day_values and hour_values hold the completed days, and day_accumulator
+    and hour_accumulator their per-feature marker statistics. The minute rows
+    of the most recent day are kept in pending, because that day may continue
+    in the next chunk.
+    """
+    return {'version': state_version,
+            'day_values': None,
+            'hour_values': None,
+            'day_accumulator': None,
+            'hour_accumulator': None,
+            'medians': None,
+            'first_minute': None,
+            'last_minute': None,
+            'pending': None}
+
+
+def load_state(filename):
+    """ Load the state stored in a file, or return a new state if the file
+    does not exist.
+    """
+    if not os.path.isfile(filename):
+        return new_state()
+    state = joblib.load(filename)
+    if state.get('version') != state_version:
+        raise ValueError("Incremental state file " + filename +
+                         " was written by an incompatible version")
+    return state
+
+
+def save_state(filename, state):
+    """ Store the state in a file. The file is written under a temporary name
+    and then renamed, so an interrupted update leaves the old state intact.
+    """
+    tmpname = filename + '.' + str(os.getpid()) + '.tmp'
+    joblib.dump(state, tmpname)
+    os.replace(tmpname, filename)
+
+
+def summarize_day(data, cf, day, hour, location):
+    """ Generate the day values and hour values for one imputed day.
+    """
+    locarray = location.label_locations(data[:, cf.latitude], data[:, cf.longitude])
+    hour_values = hour.extract_features(data, location, locarray)
+    return day.extract_features(data, location, locarray, hour_values), hour_values
+
+
+def append_rows(table, rows):
+    """ Append rows to a table that may not exist yet.
+    """
+    if table is None:
+        return np.array(rows, dtype=float, ndmin=2)
+    return np.vstack((table, rows))
+
+
+def append_day(state, day_values, hour_values):
+    """ Append the values of a completed day to the tables and accumulators.
+    """
+    state['day_values'] = append_rows(state['day_values'], day_values)
+    state['hour_values'] = append_rows(state['hour_values'], hour_values)
+    state['day_accumulator'] = accumulate.accumulate_rows(state['day_accumulator'],
+                                                          day_values)
+    state['hour_accumulator'] = accumulate.accumulate_rows(state['hour_accumulator'],
+                                                           hour_values)
+
+
+def update_state(state, minutes, cf, day, hour, location):
+    """ Add downsampled minute data to the state. Minutes at or before the
+    last minute already seen are ignored. Every day before the most recent
+    one is imputed, summarized and appended to the day and hour tables and
+    accumulators; the most recent day is kept as pending. The imputation
+    medians are estimated from the first data added and are then held fixed,
+    so that days already in the tables stay consistent with new ones.
+    """
+    positions = impute.minute_positions(cf, minutes, 0)
+    if state['last_minute'] is not None:
+        minutes = minutes[positions > state['last_minute']]
+        positions = positions[positions > state['last_minute']]
+    if len(minutes) == 0:
+        return state
+    if state['medians'] is None:
+        state['medians'] = impute.generate_medians(cf, minutes)
+        state['first_minute'] = int(np.min(positions))
+    state['last_minute'] = int(np.max(positions))
+    if state['pending'] is not None:
+        minutes = np.vstack((state['pending'], minutes))
+    days = list(impute.impute_stream([minutes], state['medians']))
+    for data in days[:-1]:
+        append_day(state, *summarize_day(data, cf, day, hour, location))
+    last_date = days[-1][0, cf.date]
+    state['pending'] = minutes[minutes[:, cf.date] == last_date]
+    return state
+
+
+def pending_values(state, cf, day, hour, location):
+    """ Return the day and hour values of the pending day, summarized from
+    the minutes seen so far, or None if there is no pending day.
+    """
+    if state['pending'] is None:
+        return None
+    data = next(impute.impute_stream([state['pending']], state['medians']))
+    return summarize_day(data, cf, day, hour, location)
+
+
+def state_values(state, cf, day, hour, location):
+    """ Return the day and hour tables of the state, including values for
+    the pending day summarized from the minutes seen so far.
+    """
+    day_values = state['day_values']
+    hour_values = state['hour_values']
+    pending = pending_values(state, cf, day, hour, location)
+    if pending is not None:
+        day_values = append_rows(day_values, pending[0])
+        hour_values = append_rows(hour_values, pending[1])
+    return day_values, hour_values
+
+
+def merge_states(first, second, cf, day, hour, location):
+    """ Merge the states of two consecutive shards of one recording without
+    reading their data again. The shards must be split between days: the
+    pending day of the first shard is completed, days without data between
+    the shards are generated from the medians, and the tables are joined
+    and the accumulators merged. The merged state keeps the medians of the
+    first shard for data added later.
+    """
+    if first['last_minute'] is None:
+        return copy.deepcopy(second)
+    if second['last_minute'] is None:
+        return copy.deepcopy(first)
+    if second['first_minute'] <= first['last_minute']:
+        raise ValueError("Shards to merge overlap or are out of order")
+    pending_date = int(first['pending'][0, cf.date])
+    second_date = second['first_minute'] // cf.minutes_in_day
+    if second_date == pending_date:
+        raise ValueError("Shards to merge must be split between days")
+    merged = copy.deepcopy(first)
+    append_day(merged, *pending_values(first, cf, day, hour, location))
+    for date in range(pending_date + 1, second_date):
+        data = impute.missing_days(cf, date, 1, first['medians'])
+        append_day(merged, *summarize_day(data, cf, day, hour, location))
+    if second['day_values'] is not None:
+        merged['day_values'] = np.vstack((merged['day_values'], second['day_values']))
+        merged['hour_values'] = np.vstack((merged['hour_values'], second['hour_values']))
+        merged['day_accumulator'].merge(second['day_accumulator'])
+        merged['hour_accumulator'].merge(second['hour_accumulator'])
+    merged['last_minute'] = second['last_minute']
+    merged['pending'] = second['pending']
+    return merged
+
+
+def state_markers(state, cf, day, hour, location, bm):
+    """ Compute the behavior markers of a state, taking the per-feature
+    statistics from its accumulators with the pending day added. The stored
+    accumulators are not changed.
+    """
+    day_values, hour_values = state_values(state, cf, day, hour, location)
+    day_accumulator = copy.deepcopy(state['day_accumulator'])
+    hour_accumulator = copy.deepcopy(state['hour_accumulator'])
+    pending = pending_values(state, cf, day, hour, location)
+    if pending is not None:
+        day_accumulator = accumulate.accumulate_rows(day_accumulator, pending[0])
+        hour_accumulator = accumulate.accumulate_rows(hour_accumulator, pending[1])
+    return bm.behavior_stats(day_values, hour_values, (day_accumulator, hour_accumulator))
+
+
+def update_file(infile, cf, day, hour, location):
+    """ Add the raw sensor data in infile to the state stored in the file
+    named by cf.incremental, store the updated state, and return the day and
+    hour tables covering all data seen so far.
+    """
+    state = load_state(cf.incremental)
+    data = np.loadtxt(infile, delimiter=',', ndmin=2)
+    if len(data) > 0:
+        update_state(state, downsample.downsample(data), cf, day, hour, location)
+        save_state(cf.incremental, state)
+    return state_values(state, cf, day, hour, location)
+
+
+def main(outfile, infiles):
+    cf = config.Config()
+    day = daystats.DayStats()
+    hour = hourstats.HourStats()
+    location = loc.Location()
+    location.read_location_mappings()
+    location.read_locations()
+    merged = new_state()
+    for infile in infiles:
+        merged = merge_states(merged, load_state(infile), cf, day, hour, location)
+    if merged['last_minute'] is None:
+        print("The state files hold no data; nothing written.")
+        return
+    save_state(outfile, merged)
+    bm = bstats.BehaviorStats()
+    markers = state_markers(merged, cf, day, hour, location, bm)
+    np.savetxt(outfile + '.bm', [markers], delimiter=',',
+               header=printheader.generate_behavior_header())
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print("Need to specify the merged state file and the state files to merge\n")
+        exit()
+    main(sys.argv[1], sys.argv[2:])
@@ -25,8 +25,10 @@ from sklearn.ensemble import RandomForestClassifier
 from sklearn.metrics import confusion_matrix
 from sklearn.model_selection import train_test_split
 
+import config
 import features
 import gps
+import locindex
 import utils
 
 
@@ -42,6 +44,11 @@ class Location:
         else:
             self.infile = filename
         self.locations = list()
+        self.index = None  # spatial index of self.locations
+        self.threshold = 0.005  # maximum distance to a known location
+        self.lookups = 0  # coordinates looked up in the index of known locations
+        self.cache_hits = 0  # repeated coordinates labeled without a lookup
+        self.gps_queries = 0  # coordinates sent to the open street map
         self.local = 1  # Use the local GPS values
         self.cross_validation = 0  # cross validation
         self.xdata = list()
@@ -82,22 +89,7 @@ class Location:
     def generate_location_num(name):
         """ Transform a location type into an index value.
         """
-        if name == 'attraction':
-            return 0
-        if name == 'house':
-            return 1
-        elif name == 'restaurant':
-            return 2
-        elif name == 'road':
-            return 3
-        elif name == 'service':
-            return 4
-        elif name == 'store':
-            return 5
-        elif name == 'work':
-            return 6
-        else:
-            return 7
+        return config.location_nums.get(name, config.location_nums['other'])
 
     def read_location_mappings(self):
         """ Generate a translate list for location names.
@@ -122,7 +114,8 @@ class Location:
         and longitude.
         """
         read_locations_index = 0
-        with open('locations', "r") as file:
+        self.locations = list()
+        with open(self.infile, "r") as file:
             for line in file:
                 x = str(str(line).strip()).split(' ', 3)
                 triple = list()
@@ -131,21 +124,50 @@ class Location:
                 triple.append(x[2])
                 self.locations.append(triple)
                 read_locations_index = read_locations_index + 1
+        self.index = locindex.load_index(self.infile, self.threshold)
         return read_locations_index
 
+    def location_index(self):
+        """ Return a spatial index of the stored locations, rebuilding it if
+        locations have been added since it was built.
+        """
+        if self.index is None or len(self.index) != len(self.locations):
+            self.index = locindex.LocationIndex(self.locations, self.threshold)
+        return self.index
+
     def find_location(self, latitude, longitude):
         """ Determine whether the input location is close (within a threshold
         distance) to the locations already stored in the external list.
+        Return the type of the nearest such location, or None.
+        """
+        self.lookups += 1
+        return self.location_index().find_location(latitude, longitude)
+
+    def find_locations(self, latitudes, longitudes):
+        """ Return the location type (or None) for each latitude, longitude
+        pair in the input arrays.
+        """
+        self.lookups += len(latitudes)
+        return self.location_index().find_locations(latitudes, longitudes)
+
+    def label_locations(self, latitudes, longitudes):
+        """ Generate the location type index for each latitude, longitude pair
+        in the input arrays. Each distinct coordinate is looked up only once.
         """
-        threshold = 0.005
-        for triple in self.locations:
-            tlat = triple[0]
-            tlong = triple[1]
-            dist = math.sqrt(((tlat - latitude) * (tlat - latitude)) +
-                             ((tlong - longitude) * (tlong - longitude)))
-            if dist < threshold:
-                return triple[2]
-        return None
+        points = numpy.column_stack((numpy.ravel(latitudes), numpy.ravel(longitudes)))
+        if len(points) == 0:
+            return numpy.zeros(0)
+        unique_points, inverse = numpy.unique(points, axis=0, return_inverse=True)
+        self.cache_hits += len(points) - len(unique_points)
+        location_types = self.find_locations(unique_points[:, 0], unique_points[:, 1])
+        type_nums = dict()
+        nums = numpy.empty(len(unique_points))
+        for i, location_type in enumerate(location_types):
+            if location_type not in type_nums:
+                name = self.map_location_name(location_type)
+                type_nums[location_type] = self.generate_location_num(name)
+            nums[i] = type_nums[location_type]
+        return nums[numpy.ravel(inverse)]
 
     def generate_gps_features(self, latitude, longitude):
         """ Generate location features.
@@ -157,9 +179,11 @@ class Location:
             location = list()
             location.append(latitude)
             location.append(longitude)
+            self.gps_queries += 1
             gps_type = gps.get_location_type(location, 'locations')
             location.append(gps_type)
             self.locations.append(location)
+            self.index = None
             return gps_type
 
     def extract_features(self, infile):
@@ -315,12 +339,11 @@ class Location:
                           accx, accy, accz, acctotal]:
                     while len(i) > self.samplesize:  # remove elements ouside window
                         del i[0]
-                    xpoint.extend(features.generate_statistical_features(i))
+                xpoint.extend(features.generate_statistical_features_list(
+                    [yaw, pitch, roll, rotx, roty, rotz, accx, accy, accz, acctotal]))
                 if self.local == 1:
-                    for i in [latitude, longitude, alt]:
-                        xpoint.extend(features.generate_statistical_features(i))
-                    for i in [course, speed, hacc, vacc]:
-                        xpoint.extend(features.generate_statistical_features(i))
+                    xpoint.extend(features.generate_statistical_features_list(
+                        [latitude, longitude, alt, course, speed, hacc, vacc]))
                     xpoint.append(distance)
                     xpoint.append(hcr)
                     xpoint.append(sr)
@@ -356,13 +379,9 @@ class Location:
         """ Use the pretrained location classifier to extract features from the
         input sensor values and map the feature vector onto a location type.
         """
-        xpoint = list()
-        for i in [yaw, pitch, roll, rotx, roty, rotz, accx, accy, accz, acctotal]:
-            xpoint.extend(features.generate_statistical_features(i))
-        for i in [latitude, longitude, alt]:
-            xpoint.extend(features.generate_statistical_features(i))
-        for i in [course, speed, hacc, vacc]:
-            xpoint.extend(features.generate_statistical_features(i))
+        xpoint = features.generate_statistical_features_list(
+            [yaw, pitch, roll, rotx, roty, rotz, accx, accy, accz, acctotal,
+             latitude, longitude, alt, course, speed, hacc, vacc])
         xpoint.append(distance)
         xpoint.append(hcr)
         xpoint.append(sr)
@@ -0,0 +1,142 @@
+#!/usr/bin/python
+
+# Spatial index of known locations, used to find the nearest known location
+# within a threshold distance of a latitude, longitude pair.
+#
+# Requires files: locations
+
+# Copyright (c) 2020. Washington State University (WSU). All rights reserved.
+# Code and data may not be used or distributed without permission from WSU.
+
+
+import hashlib
+import os.path
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+
+class LocationIndex:
+
+    def __init__(self, locations, threshold=0.005):
+        """ Constructor
+        Input is a list of locations, each starting with latitude, longitude
+        and location type.
+        """
+        self.threshold = threshold
+        self.digest = None
+        self.types = np.empty(len(locations) + 1, dtype=object)
+        for i, location in enumerate(locations):
+            self.types[i] = location[2]
+        self.types[len(locations)] = None  # returned when nothing is close
+        points = np.array([[location[0], location[1]] for location in locations],
+                          dtype=float).reshape(-1, 2)
+        if len(points) > 0:
+            self.tree = cKDTree(points)
+        else:
+            self.tree = None
+
+    def __len__(self):
+        return len(self.types) - 1
+
+    def query(self, latitudes, longitudes):
+        """ Return the position of the nearest known location within the
+        threshold distance of each input latitude, longitude pair, or the
+        number of known locations if none is close enough.
+        """
+        points = np.column_stack((np.ravel(latitudes), np.ravel(longitudes)))
+        if self.tree is None:
+            return np.full(len(points), len(self), dtype=np.int64)
+        dist, positions = self.tree.query(points, k=1,
+                                          distance_upper_bound=self.threshold)
+        return positions
+
+    def find_locations(self, latitudes, longitudes):
+        """ Return the type of the nearest known location within the threshold
+        distance of each input latitude, longitude pair (None if there is none).
+        """
+        return self.types[self.query(latitudes, longitudes)]
+
+    def find_location(self, latitude, longitude):
+        """ Return the type of the nearest known location within the threshold
+        distance of the input location, or None.
+        """
+        return self.find_locations([float(latitude)], [float(longitude)])[0]
+
+
+def file_digest(filename):
+    """ Compute a hash of the contents of a file.
+    """
+    digest = hashlib.sha1()
+    with open(filename, "rb") as file:
+        for block in iter(lambda: file.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def read_location_file(filename):
+    """ Read the list of locations from a file. Each line has syntax
+    "latitude longitude type1 type2 type3", and only the first type is kept.
+    """
+    locations = list()
+    with open(filename, "r") as file:
+        for line in file:
+            x = str(str(line).strip()).split(' ', 3)
+            if len(x) < 3:
+                continue
+            locations.append([float(x[0]), float(x[1]), x[2]])
+    return locations
+
+
+def save_index(indexname, index, locations):
+    """ Store the points and types of an index with the digest of its
+    locations file as plain arrays. The file is written under a temporary
+    name and then renamed, so processes that build the same index at the
+    same time never leave a partial file.
+    """
+    tmpname = indexname + '.' + str(os.getpid()) + '.tmp'
+    with open(tmpname, "wb") as file:
+        np.savez(file, points=np.array([location[:2] for location in locations],
+                                       dtype=float).reshape(-1, 2),
+                 types=np.array([location[2] for location in locations], dtype=str),
+                 digest=np.array(index.digest), threshold=np.array(index.threshold))
+    os.replace(tmpname, indexname)
+
+
+def read_index(indexname, digest, threshold):
+    """ Rebuild the index stored in a file if it was built from a locations
+    file with the given digest and threshold, otherwise return None.
+    """
+    with np.load(indexname, allow_pickle=False) as stored:
+        if str(stored['digest']) != digest or float(stored['threshold']) != threshold:
+            return None
+        locations = [[point[0], point[1], str(location_type)] for point, location_type
+                     in zip(stored['points'], stored['types'])]
+    index = LocationIndex(locations, threshold)
+    index.digest = digest
+    return index
+
+
+def load_index(filename, threshold=0.005):
+    """ Load the index that is stored next to a locations file. Only the
+    points and types are stored, and the tree is rebuilt from them. The index
+    is rebuilt from the locations file and stored again if it is missing or
+    unreadable, or if the locations file has changed since it was built.
+    """
+    indexname = filename + '.index'
+    digest = file_digest(filename)
+    if os.path.isfile(indexname):
+        try:
+            index = read_index(indexname, digest, threshold)
+        except Exception:
+            index = None
+        if index is not None:
+            return index
+    locations = read_location_file(filename)
+    index = LocationIndex(locations, threshold)
+    index.digest = digest
+    try:
+        save_index(indexname, index, locations)
+    except OSError:
+        pass  # index is still usable without being stored
+    return index
@@ -0,0 +1,142 @@
+#!/usr/bin/python
+
+# Describes the layout of the day, hour, and behavior marker vectors, so that
+# markers are written into and read out of one preallocated array by name.
+
+# Copyright (c) 2020. Washington State University (WSU). All rights reserved.
+# Code and data may not be used or distributed without permission from WSU.
+
+
+import functools
+
+import numpy as np
+
+import config
+
+
+# per-feature statistics computed by BehaviorStats.extract_component_features
+component_stats = ['mean', 'med', 'std', 'max', 'min', 'zc', 'mc', 'iqr',
+                   'skew', 'kurt', 'sig']
+
+# groups of day pairs scored by BehaviorStats.regularity
+regularity_periods = ['ww', 'wd', 'sun', 'mon', 'tue', 'wed', 'thu', 'fri',
+                      'sat']
+
+num_circadian_features = 3
+
+
+class MarkerSchema:
+
+    def __init__(self):
+        """ Constructor
+        """
+        self.blocks = list()  # (name, size, offset) of each block in order
+        self.columns = list()
+        self.offsets = dict()
+        self.size = 0
+
+    def add_block(self, name, columns):
+        """ Append a block of named columns to the end of the vector.
+        """
+        self.blocks.append((name, len(columns), self.size))
+        self.offsets[name] = (self.size, len(columns))
+        self.columns.extend(columns)
+        self.size += len(columns)
+
+    def header(self):
+        """ Return the csv header line naming every column of the vector.
+        """
+        return ','.join(self.columns)
+
+    def allocate(self):
+        """ Return a zero-filled vector with room for every block.
+        """
+        return np.zeros(self.size)
+
+    def block(self, vector, name):
+        """ Return the named block of vector as a view, without copying.
+        """
+        offset, size = self.offsets[name]
+        return vector[offset:offset + size]
+
+    def span(self, vector, first, last):
+        """ Return the blocks from first through last of vector as one view.
+        """
+        offset = self.offsets[first][0]
+        end = sum(self.offsets[last])
+        return vector[offset:end]
+
+
+def time_features(activity_list):
+    """ Names of the features that measure time spent in each one-class
+    activity and each primary activity.
+    """
+    names = ['oc' + str(i) + '_time' for i in range(1, 34)]
+    names += [name + '_time' for name in activity_list]
+    return names
+
+
+def hour_feature_names(activity_list=None):
+    """ Names of the hour statistics, one per column of the hour table.
+    """
+    if activity_list is None:
+        activity_list = config.Config().activity_list
+    names = ['total_rotation', 'total_acceleration', 'total_distance',
+             'number_missing']
+    names += time_features(activity_list)
+    names += [name + '_time' for name in config.location_names]
+    return names
+
+
+def day_feature_names(activity_list=None):
+    """ Names of the day statistics, one per column of the day table.
+    """
+    if activity_list is None:
+        activity_list = config.Config().activity_list
+    names = ['total_rotation', 'total_acceleration', 'total_distance',
+             'number_missing']
+    names += time_features(activity_list)
+    names += ['oc' + str(i) + '_first' for i in range(1, 34)]
+    names += [name + '_first' for name in activity_list]
+    names += [name + '_time' for name in config.location_names]
+    names += [name + '_first' for name in config.location_names]
+    return names
+
+
+@functools.lru_cache(maxsize=None)
+def cached_behavior_schema(activity_list, spectral_bands=()):
+    """ Build the behavior marker schema for a tuple of activity names and a
+    tuple of (low, high) spectral bands.
+    """
+    schema = MarkerSchema()
+    day_names = day_feature_names(list(activity_list))
+    hour_names = hour_feature_names(list(activity_list))
+    for unit, names in [('day', day_names), ('hour', hour_names)]:
+        for stat in component_stats:
+            prefix = stat + '_' + unit
+            schema.add_block(prefix, [prefix + '_' + str(i)
+                                      for i in range(1, len(names) + 1)])
+    schema.add_block('ri', ['ri_' + period + '_' + name for name in hour_names
+                            for period in regularity_periods])
+    schema.add_block('cr', ['cr_hour_' + str(i)
+                            for i in range(1, num_circadian_features + 1)])
+    if spectral_bands:
+        prefixes = ['dom_hour'] + ['band' + str(b) + '_hour'
+                                   for b in range(1, len(spectral_bands) + 1)]
+        for prefix in prefixes:
+            schema.add_block(prefix, [prefix + '_' + str(i)
+                                      for i in range(1, len(hour_names) + 1)])
+    return schema
+
+
+def behavior_schema(activity_list=None, spectral_bands=()):
+    """ Return the schema of the behavior marker vector: the component
+    statistics of each day feature and each hour feature, followed by the
+    regularity index of each hour feature and the circadian rhythm markers.
+    If spectral bands are given, the dominant frequency of each hour feature
+    and its power in each band follow.
+    """
+    if activity_list is None:
+        activity_list = config.Config().activity_list
+    return cached_behavior_schema(tuple(activity_list),
+                                  tuple(tuple(band) for band in spectral_bands))
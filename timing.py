@@ -0,0 +1,147 @@
+#!/usr/bin/python
+
+# Per-stage timing, memory accounting and profiling of a DM run. Each stage
+# records its wall time, CPU time and number of input rows, optionally its
+# memory use, and one chosen stage can be run under a profiler.
+
+# Copyright (c) 2020. Washington State University (WSU). All rights reserved.
+# Code and data may not be used or distributed without permission from WSU.
+
+
+import contextlib
+import cProfile
+import json
+import resource
+import sys
+import time
+import tracemalloc
+
+
+class StageTimer:
+
+    def __init__(self, enabled=True, profile_stage=None, profiler='cprofile',
+                 profile_prefix='dm', memory=False):
+        """ Constructor
+        A disabled timer records nothing, so stages can be marked without
+        checking whether timing was requested. With memory set, each stage
+        also records the peak memory allocated while it runs (traced with
+        tracemalloc, which includes NumPy arrays) and the peak resident set
+        size of the process so far.
+        """
+        self.enabled = enabled
+        self.memory = enabled and memory
+        self.start_rss = peak_rss_mb() if self.memory else None
+        self.arrays = list()
+        self.info = dict()
+        self.profile_stage = profile_stage
+        self.profiler = profiler
+        self.profile_prefix = profile_prefix
+        self.stages = list()
+        self.counters = dict()
+        self.profile_files = list()
+
+    @contextlib.contextmanager
+    def stage(self, name, rows=None):
+        """ Time the enclosed block as the named stage, with rows input rows.
+        """
+        if not self.enabled:
+            yield
+            return
+        profiler = self.start_profile(name)
+        if self.memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+            traced = tracemalloc.get_traced_memory()[0]
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        try:
+            yield
+        finally:
+            record = {'stage': name,
+                      'wall_seconds': time.perf_counter() - wall,
+                      'cpu_seconds': time.process_time() - cpu}
+            if rows is not None:
+                record['rows'] = int(rows)
+            if self.memory:
+                current, peak = tracemalloc.get_traced_memory()
+                record['peak_allocated_mb'] = (peak - traced) / 2 ** 20
+                record['retained_mb'] = (current - traced) / 2 ** 20
+                record['peak_rss_mb'] = peak_rss_mb()
+            self.stages.append(record)
+            if profiler is not None:
+                self.stop_profile(name, profiler)
+
+    def start_profile(self, name):
+        """ Start a profiler if name is the stage chosen for profiling.
+        """
+        if name != self.profile_stage:
+            return None
+        if self.profiler == 'pyinstrument':
+            import pyinstrument  # optional, only needed for this profiler
+            profiler = pyinstrument.Profiler()
+            profiler.start()
+            return profiler
+        profiler = cProfile.Profile()
+        profiler.enable()
+        return profiler
+
+    def stop_profile(self, name, profiler):
+        """ Stop a profiler and dump its results next to the output files:
+        a pstats file for cProfile or an html page for pyinstrument.
+        """
+        if self.profiler == 'pyinstrument':
+            profiler.stop()
+            filename = self.profile_prefix + '.' + name + '.html'
+            with open(filename, "w") as file:
+                file.write(profiler.output_html())
+        else:
+            profiler.disable()
+            filename = self.profile_prefix + '.' + name + '.prof'
+            profiler.dump_stats(filename)
+        self.profile_files.append(filename)
+
+    def array(self, stage, name, array):
+        """ Record the shape and size of a large array made by a stage.
+        """
+        if self.memory and array is not None:
+            self.arrays.append({'stage': stage, 'array': name,
+                                'shape': list(array.shape), 'dtype': str(array.dtype),
+                                'mb': array.nbytes / 2 ** 20})
+
+    def count(self, name, value):
+        """ Record a counter value, such as the number of location lookups.
+        """
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + int(value)
+
+    def report(self):
+        """ Return the recorded stages, counters and totals as a dictionary.
+        """
+        report = {'stages': self.stages,
+                  'counters': self.counters,
+                  'total_wall_seconds': sum(s['wall_seconds'] for s in self.stages),
+                  'total_cpu_seconds': sum(s['cpu_seconds'] for s in self.stages),
+                  'profiles': self.profile_files}
+        if self.memory:
+            report['arrays'] = self.arrays
+            report['start_rss_mb'] = self.start_rss
+            report['peak_rss_mb'] = peak_rss_mb()
+        report.update(self.info)
+        return report
+
+    def write(self, filename):
+        """ Write the report as json, if timing is enabled.
+        """
+        if self.enabled:
+            with open(filename, "w") as file:
+                json.dump(self.report(), file, indent=2)
+
+
+def peak_rss_mb():
+    """ Return the peak resident set size of this process in megabytes.
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':  # reported in bytes rather than kilobytes
+        return peak / 2 ** 20
+    return peak / 2 ** 10